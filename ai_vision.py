@@ -860,18 +860,28 @@ class MedicalVisionBrain:
             print(f"Cropping failed: {e}")
             return pil_image
 
-    def _get_probs(self, image, label_list):
-        if not label_list: return [0.0]
+    def encode_image(self, image):
+        """
+        Runs the image tower once and returns normalized features that can be
+        scored against any number of label lists.
+        """
         # Ensure image is RGB before processing
         if image.mode != 'RGB':
             image = image.convert('RGB')
             
         image_input = self.preprocess(image).unsqueeze(0)
-        text_inputs = self.tokenizer(label_list)
         with torch.no_grad():
             image_features = self.model.encode_image(image_input)
-            text_features = self.model.encode_text(text_inputs)
             image_features /= image_features.norm(dim=-1, keepdim=True)
+        return image_features
+
+    def _get_probs(self, image, label_list):
+        if not label_list: return [0.0]
+        # Accept either a PIL image or features from encode_image()
+        image_features = self.encode_image(image) if isinstance(image, Image.Image) else image
+        text_inputs = self.tokenizer(label_list)
+        with torch.no_grad():
+            text_features = self.model.encode_text(text_inputs)
             text_features /= text_features.norm(dim=-1, keepdim=True)
             text_probs = (100.0 * image_features @ text_features.T).softmax(dim=-1)
         return text_probs[0].tolist()
@@ -926,15 +936,19 @@ class MedicalVisionBrain:
         # -------------------------------------------------
         # STEP 1: IMAGE QUALITY & GATEKEEPER
         # -------------------------------------------------
-        quality = self.check_image_quality(original_image)
+        # Encode once; every stage below scores against these features
+        original_features = self.encode_image(original_image)
+        quality = self.check_image_quality(original_features)
         quality_warn = quality.get("warning", "")
         is_photo_of_film = not quality.get("is_good", True)
 
         # 🟢 CRITICAL FIX: If it's a photo, CROP IT before analysis
-        analysis_image = original_image
+        analysis_features = original_features
         if is_photo_of_film:
             print("Detected photo artifact. Applying Smart Crop...")
             analysis_image = self.smart_crop_film(original_image)
+            if analysis_image is not original_image:
+                analysis_features = self.encode_image(analysis_image)
 
         gatekeeper_menu = [
             "X-Ray Image", "CT Scan Image", "MRI Scan Image", 
@@ -944,7 +958,7 @@ class MedicalVisionBrain:
         ]
         
         # USE THE CROPPED IMAGE FOR ANALYSIS
-        type_probs = self._get_probs(analysis_image, gatekeeper_menu)
+        type_probs = self._get_probs(analysis_features, gatekeeper_menu)
         detected_type = gatekeeper_menu[type_probs.index(max(type_probs))]
         
         # Non-Medical Exit
@@ -982,7 +996,7 @@ class MedicalVisionBrain:
             final_diagnosis_list = candidate_labels
         else:
             # USE CROPPED IMAGE
-            part_probs = self._get_probs(analysis_image, candidate_labels)
+            part_probs = self._get_probs(analysis_features, candidate_labels)
             scan_type_label = candidate_labels[part_probs.index(max(part_probs))]
             
             if "MRI" in scan_type_label: final_modality = "MRI"
@@ -995,7 +1009,7 @@ class MedicalVisionBrain:
         # STEP 3: INITIAL DIAGNOSIS
         # -------------------------------------------------
         # USE CROPPED IMAGE
-        diag_probs = self._get_probs(analysis_image, final_diagnosis_list)
+        diag_probs = self._get_probs(analysis_features, final_diagnosis_list)
         best_condition = final_diagnosis_list[diag_probs.index(max(diag_probs))]
         confidence = self.calibrate_confidence(max(diag_probs) * 100)
         
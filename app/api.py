@@ -163,25 +163,84 @@
 #     return response
 
 # app.mount("/outputs", StaticFiles(directory="outputs"), name="outputs")
-from fastapi import FastAPI, File, UploadFile, Response, Form
+from fastapi import FastAPI, File, UploadFile, Response, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
-import shutil
 import os
 import uuid
-import sqlite3
 import datetime
+import asyncio
+import hashlib
+import sys
+from contextlib import asynccontextmanager
+from typing import List
 
 # --- IMPORT ALL ENGINES ---
-from core.ai_vision import get_brain as get_vision_brain
-from core.doc_to_text import convert_any_to_text
-from core.handwriting import get_handwriting_brain
-from core.lab_parser import extract_all_details
+from core.ai_vision import get_brain as get_vision_brain, VISION_MODEL_NAME, VISION_BACKEND, knowledge_base_version
+from core.doc_to_text import convert_any_to_text, convert_any_to_text_detailed, OCR_ENGINE_VERSION
+from core.handwriting import get_handwriting_brain, HANDWRITING_ENGINE_VERSION
+from core.lab_parser import extract_all_details, LAB_PARSER_VERSION
 from core.integrator import generate_master_verdict
 from core.report_generator import generate_official_pdf
 from core.magic_lens import get_magic_lens
-
-app = FastAPI()
+from core.cache import LRUCache, DiskCache, TieredCache
+from core.image_context import ImageContext
+from core.quantization import quantization_enabled
+from app.batching import MicroBatcher
+from app.executors import StageExecutors
+from app.scan_history import ScanHistory, resolve_db_path
+from app.model_registry import ModelRegistry
+from app.heatmap_jobs import HeatmapJobs
+
+# --- INFERENCE BATCHING (tunable per deployment) ---
+BATCH_MAX_SIZE = int(os.environ.get("MEDIBOT_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_DELAY_MS = float(os.environ.get("MEDIBOT_BATCH_MAX_DELAY_MS", "15"))
+
+# --- DEFERRED HEATMAPS (rendered after the verdict is returned) ---
+HEATMAP_CONCURRENCY = int(os.environ.get("MEDIBOT_HEATMAP_CONCURRENCY", "2"))
+HEATMAP_MAX_PENDING = int(os.environ.get("MEDIBOT_HEATMAP_MAX_PENDING", "32"))  # past this, heatmaps are skipped
+HEATMAP_STATUS_DIR = os.environ.get("MEDIBOT_HEATMAP_STATUS_DIR", "cache/heatmap_jobs")  # shared by every worker
+
+# --- STAGE POOLS (0 = size from CPU count) ---
+THREAD_WORKERS = int(os.environ.get("MEDIBOT_THREAD_WORKERS", "0"))
+PROCESS_WORKERS = int(os.environ.get("MEDIBOT_PROCESS_WORKERS", "0"))
+
+# --- SCAN HISTORY DB (unset = ./medibot.db or a bounded search of sibling folders) ---
+DB_PATH = os.environ.get("MEDIBOT_DB_PATH")
+
+# --- PRELOAD MODE (set by gunicorn.conf.py): load every model at import, before workers fork ---
+PRELOAD_MODELS = os.environ.get("MEDIBOT_PRELOAD", "0") == "1"
+
+# --- RESULT CACHE (repeat uploads skip inference, OCR and PDF rendering) ---
+CACHE_DIR = os.environ.get("MEDIBOT_CACHE_DIR", "cache/results")
+CACHE_MEMORY_ENTRIES = int(os.environ.get("MEDIBOT_CACHE_MEMORY_ENTRIES", "512"))
+CACHE_DISK_MB = int(os.environ.get("MEDIBOT_CACHE_DISK_MB", "512"))
+
+# --- MODELS (loaded in the background; TrOCR only when a handwritten scan needs it) ---
+models = ModelRegistry()
+models.register("vision", get_vision_brain)
+models.register("magic_lens", get_magic_lens)
+models.register("handwriting", get_handwriting_brain, eager=False)
+
+if PRELOAD_MODELS:
+    # Weights land in the parent process and are shared copy-on-write by every forked worker
+    models.load_all()
+
+@asynccontextmanager
+async def lifespan(app):
+    global scan_history
+    # Opened per worker: sqlite connections and the writer thread must not cross a fork
+    scan_history = ScanHistory(SCAN_DB_PATH)
+    # Model loading runs beside the server: /healthz, /history and /outputs answer right away
+    models.start()
+    yield
+    heatmap_jobs.shutdown()
+    models.shutdown()
+    stage_pools.shutdown()
+    scan_history.close()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -190,60 +249,157 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-vision_brain = get_vision_brain()
-handwriting_brain = get_handwriting_brain()
-magic_lens = get_magic_lens()
+# Engines whose code shapes a cached result; editing any of them invalidates the cache
+PIPELINE_MODULES = [
+    "core.ai_vision", "core.quantization", "core.image_context", "core.doc_to_text", "core.handwriting",
+    "core.lab_parser", "core.integrator", "core.magic_lens", "core.report_generator",
+]
+
+def source_fingerprint(module_names):
+    """sha256 over the source files of the given (already imported) modules."""
+    digest = hashlib.sha256()
+    for name in module_names:
+        with open(sys.modules[name].__file__, "rb") as f: digest.update(f.read())
+    return digest.hexdigest()
+
+# Cached results are only valid for the model + KB + engine code that produced them
+# (fingerprinted from files, so the cache works before the models finish loading).
+# The version constants alone are not enough: they are rarely bumped on a change.
+PIPELINE_VERSION = hashlib.sha256("|".join([
+    VISION_MODEL_NAME, VISION_BACKEND, knowledge_base_version(), "int8" if quantization_enabled() else "fp32",
+    OCR_ENGINE_VERSION, HANDWRITING_ENGINE_VERSION, LAB_PARSER_VERSION, source_fingerprint(PIPELINE_MODULES)
+]).encode("utf-8")).hexdigest()[:16]
+
+result_cache = TieredCache(
+    LRUCache(max_entries=CACHE_MEMORY_ENTRIES),
+    DiskCache(CACHE_DIR, max_bytes=CACHE_DISK_MB * 1024 * 1024)
+)
+
+# Blocking work never runs on the event loop: see app/executors.py
+stage_pools = StageExecutors(THREAD_WORKERS, PROCESS_WORKERS)
+
+def analyze_images(image_paths):
+    return models.get_sync("vision").analyze_images(image_paths)
+
+# Heatmaps for triage >= 2 scans run here, off the request path; any worker can answer a poll
+heatmap_jobs = HeatmapJobs(
+    max_concurrency=HEATMAP_CONCURRENCY,
+    max_pending=HEATMAP_MAX_PENDING,
+    status_dir=HEATMAP_STATUS_DIR,
+    runner=lambda fn, *args: stage_pools.run("io", fn, *args)
+)
+
+# Concurrent /analyze image requests share one encode_image forward per batch
+vision_batcher = MicroBatcher(
+    analyze_images,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_delay_ms=BATCH_MAX_DELAY_MS,
+    runner=lambda fn, items: stage_pools.run("vision", fn, items)
+)
 
 os.makedirs("outputs/heatmaps", exist_ok=True)
 os.makedirs("outputs/reports", exist_ok=True)
 os.makedirs("temp", exist_ok=True)
 
-# 🟢 DATABASE HELPER: Find the DB and Save Scan
+# 🟢 DATABASE HELPER: Save Scan (long-lived connection + batched background writer)
+# Resolved once here; a missing DB stops the worker at startup instead of crawling per request
+SCAN_DB_PATH = resolve_db_path(DB_PATH)
+scan_history = None  # ScanHistory, opened in lifespan()
+
 def save_scan_to_db(user_id, scan_type, verdict, severity, report_url):
-    """Saves the scan result to the database for history tracking."""
-    db_path = "medibot.db" # Default local
-    
-    # Try to find the main DB in sibling folders if not here
-    if not os.path.exists(db_path):
-        # Look one level up for other project folders
-        parent = os.path.dirname(os.getcwd())
-        for root, dirs, files in os.walk(parent):
-            if "medibot.db" in files:
-                db_path = os.path.join(root, "medibot.db")
-                break
-    
+    """Queues the scan result for history tracking; the write happens in a batched transaction."""
+    scan_history.record(user_id, scan_type, verdict, severity, report_url)
+    print(f"✅ Scan queued for DB ({scan_history.db_path}) for User: {user_id}")
+
+
+# 🟢 SCAN HISTORY QUERIES
+@app.get("/history")
+async def scan_history_page(
+    user_id: str = None,
+    scan_type: str = None,
+    severity: int = None,
+    min_severity: int = None,
+    since: str = None,
+    until: str = None,
+    limit: int = 50,
+    cursor: str = None
+):
+    """Newest-first scan history; pass next_cursor back as ?cursor= for the next page."""
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Create Scans Table if it doesn't exist
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS scans (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id TEXT,
-                scan_type TEXT,
-                verdict TEXT,
-                severity INTEGER,
-                report_url TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        return await stage_pools.run(
+            "history",
+            lambda: scan_history.list_scans(
+                limit=limit, cursor=cursor, user_id=user_id, scan_type=scan_type,
+                severity=severity, min_severity=min_severity, since=since, until=until
             )
-        ''')
-        
-        cursor.execute(
-            "INSERT INTO scans (user_id, scan_type, verdict, severity, report_url) VALUES (?, ?, ?, ?, ?)",
-            (user_id, scan_type, verdict, severity, report_url)
         )
-        
-        conn.commit()
-        conn.close()
-        print(f"✅ Scan saved to DB ({db_path}) for User: {user_id}")
-    except Exception as e:
-        print(f"⚠️ Database Save Error: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/history/summary")
+async def scan_history_summary(
+    user_id: str = None,
+    scan_type: str = None,
+    severity: int = None,
+    min_severity: int = None,
+    since: str = None,
+    until: str = None
+):
+    """Scan counts by verdict for dashboards."""
+    try:
+        return await stage_pools.run(
+            "history",
+            lambda: scan_history.verdict_counts(
+                user_id=user_id, scan_type=scan_type, severity=severity,
+                min_severity=min_severity, since=since, until=until
+            )
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/favicon.ico", include_in_schema=False)
 async def favicon():
     return Response(status_code=204)
 
+# 🟢 HEALTH PROBES
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the worker is up and serving (models may still be loading)."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once every eager model is loaded, 503 while loading or after a failed load."""
+    status = models.status()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+@app.get("/heatmap/{job_id}")
+async def heatmap_status(job_id: str):
+    """
+    Poll a deferred heatmap: pending -> running -> done (heatmap_url is live, the report now embeds it)
+    | error | skipped (queue was full) | cancelled. The report itself is live from the first response.
+    """
+    status = await heatmap_jobs.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown heatmap job")
+    return status
+
+@app.get("/metrics")
+async def metrics():
+    """Per-stage queue depth and timings for the executor pools and the vision batcher."""
+    handwriting_brain = models.loaded("handwriting")
+    return {
+        "executors": stage_pools.stats(),
+        "vision_batcher": vision_batcher.stats(),
+        "result_cache": result_cache.stats(),
+        "scan_history": scan_history.stats(),
+        "models": models.status(),
+        "heatmap_jobs": heatmap_jobs.stats(),
+        "handwriting": handwriting_brain.stats() if handwriting_brain else None
+    }
+
 # 🟢 DATA FORMATTER FOR FRONTEND TABLE
 def format_report_data(vision_result=None, lab_data=None):
     table_data = []
@@ -277,36 +433,136 @@ def format_report_data(vision_result=None, lab_data=None):
 
     return table_data
 
-@app.post("/analyze")
-async def analyze_file(
-    file: UploadFile = File(...),
-    user_id: str = Form(None)  # 🟢 ADDED: Accepts User ID from Frontend
-):
-    print(f"📥 Received: {file.filename} from User: {user_id}")
+IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp", ".dcm", ".webp"]
+
+def save_upload(file):
+    """Copies an upload into temp/ and returns (scan_id, file_ext, temp_path, cache_key)."""
     scan_id = str(uuid.uuid4())[:8]
     file_ext = os.path.splitext(file.filename)[1].lower()
     temp_path = f"temp/{scan_id}{file_ext}"
 
+    # Hash while copying so the content address costs no extra pass over the bytes
+    digest = hashlib.sha256()
     with open(temp_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+        for chunk in iter(lambda: file.file.read(1024 * 1024), b""):
+            digest.update(chunk)
+            buffer.write(chunk)
+    cache_key = f"{digest.hexdigest()}-{file_ext.lstrip('.')}-{PIPELINE_VERSION}"
+    return scan_id, file_ext, temp_path, cache_key
+
+def lookup_cached_scan(cache_key):
+    """Returns the cached entry for an upload if its report (and heatmap) still exist."""
+    entry = result_cache.get(cache_key)
+    if not entry: return None
+    heatmap_status = entry["response"].get("heatmap_status")
+    if heatmap_status == "pending":
+        # Shared only while its job is queued or running on some worker: one left
+        # behind by a cancelled job would stay pending forever
+        job = heatmap_jobs.read(entry["response"]["heatmap_job_id"])
+        return entry if job and job["status"] in ("pending", "running") else None
+    if heatmap_status not in (None, "done"): return None  # error / skipped: run the scan again
+    if not os.path.exists(entry["report_path"]): return None
+    if entry.get("heatmap_path") and not os.path.exists(entry["heatmap_path"]): return None
+    return entry
+
+async def serve_cached_scan(entry, temp_path, user_id=None):
+    print(f"♻️ Cache hit: {entry['report_path']}")
+    await stage_pools.run("io", remove_file, temp_path)
+    response = entry["response"]
+    if user_id:
+        save_scan_to_db(
+            user_id,
+            entry["scan_type"],
+            entry["verdict"].get("verdict", "Unknown"),
+            entry["verdict"].get("severity_score", 0),
+            response["report_url"]
+        )
+    response["cached"] = True
+    return response
+
+def write_bytes(path, data):
+    with open(path, "wb") as f: f.write(data)
+
+def replace_bytes(path, data):
+    # A report polled while it is being written is either missing or complete, never half a file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write_bytes(tmp_path, data)
+    os.replace(tmp_path, path)
+
+def mark_cached_heatmap(cache_key, heatmap_status, heatmap_path=None):
+    """Settles a pending cache entry once its heatmap job has finished (done | error)."""
+    entry = result_cache.peek(cache_key)  # bookkeeping, not a request: kept out of the hit rate
+    if not entry: return
+    entry["heatmap_path"] = heatmap_path
+    entry["response"]["heatmap_status"] = heatmap_status
+    result_cache.put(cache_key, entry)
+
+async def render_report(report_filename, report_args, heatmap_path=None):
+    master_verdict, lab_data, prescription_text = report_args
+    pdf_bytes = await stage_pools.run(
+        "report",
+        generate_official_pdf,
+        master_verdict,
+        lab_data,
+        prescription_text,
+        heatmap_path,
+        process=True
+    )
+    await stage_pools.run("io", replace_bytes, report_filename, pdf_bytes)
+
+async def render_heatmap_job(image, vision_result, heatmap_path, report_filename, report_args, cache_key=None, cache_saved=None):
+    """
+    Background half of a triage >= 2 scan: the overlay, then the report re-rendered with it
+    embedded. The report written on the request path (no overlay) is swapped atomically, so
+    a failed or cancelled job leaves a complete report behind.
+    image: an undecoded ImageContext (source bytes only); it is decoded here, when the job runs.
+    cache_saved: asyncio.Event set once the request has written the cache entry this job settles.
+    """
+    async def settle(heatmap_status, path=None):
+        if not cache_key: return
+        if cache_saved is not None: await cache_saved.wait()
+        await stage_pools.run("io", mark_cached_heatmap, cache_key, heatmap_status, path)
 
+    try:
+        magic_lens = await models.get("magic_lens")
+        lens_result = await stage_pools.run("heatmap", magic_lens.generate_heatmap, image, vision_result, heatmap_path)
+        if lens_result.get("status") != "success":
+            raise RuntimeError(lens_result.get("message", "Heatmap generation failed"))
+        await render_report(report_filename, report_args, heatmap_path)
+    except Exception:
+        await settle("error")
+        raise
+
+    await settle("done", heatmap_path)
+    return {"heatmap_url": f"http://127.0.0.1:8000/{heatmap_path}"}
+
+def remove_file(path):
+    if os.path.exists(path): os.remove(path)
+
+async def process_scan(scan_id, file_ext, temp_path, user_id=None, vision_result=None, cache_key=None, image=None):
+    """
+    Runs everything after the vision stage: OCR, verdict, heatmap, report and history.
+    image: the upload's ImageContext, decoded once and shared by every engine below.
+    """
+    source = image if image is not None else temp_path
     result = {}
     master_verdict = {}
     lab_data = None
-    vision_result = None
-    heatmap_local_path = None
+    deferred_heatmap_path = None
     prescription_text = None 
     
     # --- ROUTING ---
-    if file_ext in [".jpg", ".jpeg", ".png", ".bmp", ".dcm", ".webp"]:
-        vision_result = vision_brain.analyze_image(temp_path)
-        
+    if file_ext in IMAGE_EXTENSIONS:
         # 🟢 HANDWRITTEN / DOCUMENT PROCESSING
         if vision_result.get("modality") in ["Handwritten", "Document"]:
             if vision_result.get("modality") == "Handwritten":
-                text_content = handwriting_brain.read_handwriting(temp_path)
+                handwriting_brain = await models.get("handwriting")
+                handwriting = await stage_pools.run("handwriting", handwriting_brain.read_handwriting_detailed, source)
+                text_content = handwriting["text"]
+                # truncated: the decoding budget cut the text short, so the read may be incomplete
+                result["handwriting"] = {key: handwriting[key] for key in ("truncated", "confidence", "lines", "lines_decoded")}
             else:
-                _, _, text_content = convert_any_to_text(temp_path)
+                _, _, text_content = await stage_pools.run("ocr", convert_any_to_text, source, process=True)
 
             # 🚨 SELECTIVE RAW DATA: Only trigger if specifically a Prescription
             # We look for "Rx", "Sig", or the AI's own label
@@ -325,13 +581,16 @@ async def analyze_file(
             # MEDICAL SCAN (X-Ray/CT/MRI)
             master_verdict = generate_master_verdict(vision_result, None)
             if vision_result.get("triage", 0) >= 2:
-                heatmap_local_path = f"outputs/heatmaps/overlay_{scan_id}.jpg"
-                lens_result = magic_lens.generate_heatmap(temp_path, vision_result, heatmap_local_path)
-                if lens_result.get("status") == "success":
-                    result["heatmap_url"] = f"http://127.0.0.1:8000/{heatmap_local_path}"
+                # Rendered in the background (see render_heatmap_job); the verdict does not wait for it
+                deferred_heatmap_path = f"outputs/heatmaps/overlay_{scan_id}.jpg"
+                result["heatmap_url"] = f"http://127.0.0.1:8000/{deferred_heatmap_path}"
 
     elif file_ext == ".pdf":
-        _, _, text_content = convert_any_to_text(temp_path)
+        # On a thread: scanned pages fan out over the OCR page pool (core/doc_to_text.py),
+        # so a PDF never starts a second process pool inside a stage worker
+        ocr_result = await stage_pools.run("ocr", convert_any_to_text_detailed, temp_path)
+        text_content = ocr_result["text"]
+        result["pages"] = ocr_result["pages"]  # which pages were native text, OCRed or skipped
         
         # 🚨 SELECTIVE RAW DATA: Check if PDF is a prescription
         # If it's a blood report, it won't have "Rx" or "Sig", so prescription_text stays None
@@ -345,25 +604,23 @@ async def analyze_file(
     # --- REPORT GENERATION ---
     # Because prescription_text is only set for Rx files, 
     # the "Medication Ledger" will only appear for prescriptions!
-    pdf_bytes = generate_official_pdf(
-        master_verdict, 
-        lab_data if lab_data else {}, 
-        prescription_data=prescription_text,
-        heatmap_path=heatmap_local_path
-    )
-    
     report_filename = f"outputs/reports/report_{scan_id}.pdf"
-    with open(report_filename, "wb") as f: f.write(pdf_bytes)
-
-    if os.path.exists(temp_path): os.remove(temp_path)
+    report_args = (master_verdict, lab_data if lab_data else {}, prescription_text)
+    # Rendered here for every scan, so report_url is live with the response; a deferred
+    # heatmap re-renders it with the overlay embedded (see render_heatmap_job)
+    await render_report(report_filename, report_args)
+    if deferred_heatmap_path:
+        # The queued job holds only the source bytes (a fresh, undecoded context) and decodes them when it starts
+        job_image = ImageContext(image.data, image.path) if image is not None else await stage_pools.run("io", ImageContext.from_path, temp_path)
+    await stage_pools.run("io", remove_file, temp_path)
 
     formatted_data = format_report_data(vision_result, lab_data)
     
     final_report_url = f"http://127.0.0.1:8000/{report_filename}"
+    scan_type = vision_result.get("modality", "Unknown") if vision_result else "PDF"
 
     # 🟢 SAVE TO DATABASE
     if user_id:
-        scan_type = vision_result.get("modality", "Unknown") if vision_result else "PDF"
         save_scan_to_db(
             user_id, 
             scan_type, 
@@ -380,9 +637,101 @@ async def analyze_file(
         "report_data": formatted_data
     }
     
+    if "pages" in result:
+        response["pages"] = result["pages"]
+    if "handwriting" in result:
+        response["handwriting"] = result["handwriting"]
+
     if "heatmap_url" in result: 
         response["heatmap_url"] = result["heatmap_url"]
+        response["heatmap_status"] = "pending"
+        response["heatmap_job_id"] = scan_id
+        response["heatmap_status_url"] = f"http://127.0.0.1:8000/heatmap/{scan_id}"
+
+    cache_saved = asyncio.Event()
+    if deferred_heatmap_path:
+        # Submitted before the cache write (it only needs the key); it waits on cache_saved
+        # before settling the entry, so the entry it updates always exists
+        job = await heatmap_jobs.submit(
+            scan_id,
+            lambda: render_heatmap_job(
+                job_image, vision_result, deferred_heatmap_path, report_filename, report_args, cache_key, cache_saved
+            ),
+            heatmap_url=response["heatmap_url"],
+            report_url=final_report_url
+        )
+        if job["status"] == "skipped":
+            # Queue full: the report keeps no overlay (the cached entry stays a miss)
+            response.pop("heatmap_url")
+            response["heatmap_status"] = "skipped"
+
+    if cache_key:
+        # JSON encoding and the disk tier's file write stay off the event loop
+        try:
+            await stage_pools.run("io", result_cache.put, cache_key, {
+                "vision_result": vision_result,
+                "lab_data": lab_data,
+                "verdict": master_verdict,
+                "scan_type": scan_type,
+                "report_path": report_filename,
+                "heatmap_path": None,  # set by render_heatmap_job once the overlay exists
+                "response": response
+            })
+        finally:
+            cache_saved.set()
 
     return response
 
+@app.post("/analyze")
+async def analyze_file(
+    file: UploadFile = File(...),
+    user_id: str = Form(None)  # 🟢 ADDED: Accepts User ID from Frontend
+):
+    print(f"📥 Received: {file.filename} from User: {user_id}")
+    scan_id, file_ext, temp_path, cache_key = await stage_pools.run("io", save_upload, file)
+
+    cached = await stage_pools.run("io", lookup_cached_scan, cache_key)
+    if cached:
+        return await serve_cached_scan(cached, temp_path, user_id)
+
+    vision_result = None
+    image = None
+    if file_ext in IMAGE_EXTENSIONS:
+        image = await stage_pools.run("io", ImageContext.from_path, temp_path)
+        await models.get("vision")
+        vision_result = await vision_batcher.submit(image)
+
+    return await process_scan(scan_id, file_ext, temp_path, user_id, vision_result, cache_key, image)
+
+@app.post("/analyze/batch")
+async def analyze_batch(
+    files: List[UploadFile] = File(...),
+    user_id: str = Form(None)
+):
+    """Analyzes a burst of uploads; all images go through the vision brain as real batches."""
+    print(f"📥 Received batch of {len(files)} files from User: {user_id}")
+    uploads = [await stage_pools.run("io", save_upload, f) for f in files]
+    cached = [await stage_pools.run("io", lookup_cached_scan, cache_key) for _, _, _, cache_key in uploads]
+
+    image_slots = [i for i, (_, file_ext, _, _) in enumerate(uploads) if file_ext in IMAGE_EXTENSIONS and not cached[i]]
+    vision_results = [None] * len(uploads)
+    images = [None] * len(uploads)
+    if image_slots:
+        for i in image_slots:
+            images[i] = await stage_pools.run("io", ImageContext.from_path, uploads[i][2])
+        vision_brain = await models.get("vision")
+        batch_results = await stage_pools.run("vision", vision_brain.analyze_images, [images[i] for i in image_slots])
+        for i, vision_result in zip(image_slots, batch_results):
+            vision_results[i] = vision_result
+
+    results = await asyncio.gather(*[
+        serve_cached_scan(entry, temp_path, user_id) if entry else
+        process_scan(scan_id, file_ext, temp_path, user_id, vision_result, cache_key, image)
+        for (scan_id, file_ext, temp_path, cache_key), vision_result, entry, image in zip(uploads, vision_results, cached, images)
+    ])
+    for file, response in zip(files, results):
+        response["filename"] = file.filename
+
+    return {"count": len(results), "results": results}
+
 app.mount("/outputs", StaticFiles(directory="outputs"), name="outputs")
\ No newline at end of file
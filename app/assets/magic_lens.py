@@ -1,4 +1,5 @@
 import torch
+import torch.nn.functional as F
 from torchvision import models, transforms
 from PIL import Image
 import numpy as np
@@ -11,6 +12,15 @@ class MagicLensAI:
         self.device = torch.device("cpu")
         print(f"⚙️ Magic Lens initialized on: {self.device}")
 
+        self.preprocess = transforms.Compose([
+            transforms.Resize((224, 224)),
+            transforms.ToTensor(),
+            transforms.Normalize(
+                mean=[0.485, 0.456, 0.406],
+                std=[0.229, 0.224, 0.225]
+            ),
+        ])
+
         try:
             # We use DenseNet121 as a visualizer. 
             # ideally, this should share weights with your main model, 
@@ -20,15 +30,6 @@ class MagicLensAI:
             )
             self.model.eval()
             self.model.to(self.device)
-
-            self.preprocess = transforms.Compose([
-                transforms.Resize((224, 224)),
-                transforms.ToTensor(),
-                transforms.Normalize(
-                    mean=[0.485, 0.456, 0.406],
-                    std=[0.229, 0.224, 0.225]
-                ),
-            ])
             self.ai_ready = True
         except Exception as e:
             print(f"⚠️ AI Load Error: {e}")
@@ -72,99 +73,125 @@ class MagicLensAI:
             if verdict_text.startswith("⚠️"): return True
         return False
 
-    def generate_heatmap(self, image_path, triage_value=1, save_path="outputs/overlay_output.jpg", scan_data=None, final_verdict=None):
-        try:
-            if not self.ai_ready:
-                return {"status": "error", "message": "AI Model not loaded."}
+    # --- 🟢 GRAD-CAM (vectorized, head-only backward) ---
+    def compute_cams(self, images):
+        """
+        Grad-CAM maps (N x h x w, each in [0, 1]) for a list of PIL images in one pass.
+        The DenseNet trunk runs without autograd; gradients only flow from the
+        predicted logit back through the classifier head to features.norm5.
+        """
+        input_tensor = torch.stack([self.preprocess(img) for img in images]).to(self.device)
+
+        with torch.no_grad():
+            features = self.model.features(input_tensor)  # ends at norm5 (target layer)
+        features.requires_grad_(True)
+
+        # DenseNet head: relu -> global avg pool -> classifier (same as DenseNet.forward)
+        pooled = torch.flatten(F.adaptive_avg_pool2d(F.relu(features), (1, 1)), 1)
+        output = self.model.classifier(pooled)
+        target_category = output.argmax(dim=1, keepdim=True)
+        # Each image's logit depends only on its own features, so one backward serves the batch
+        grads, = torch.autograd.grad(output.gather(1, target_category).sum(), features)
+
+        with torch.no_grad():
+            weights = grads.mean(dim=(2, 3))                                  # N x C
+            # Activations are taken after the head's ReLU, as the hooked norm5 output was
+            # (DenseNet.forward applies relu in place on it): batched tensordot over channels
+            cams = torch.relu(torch.einsum("nc,nchw->nhw", weights, F.relu(features)))
+            peaks = cams.amax(dim=(1, 2), keepdim=True)
+            cams = torch.where(peaks > 0, cams / peaks.clamp(min=1e-12), cams)
+        return cams.cpu().numpy()
+
+    def _prepare_image(self, image_path):
+        img_pil = Image.open(image_path).convert("RGB")
+        # 🟢 APPLY SMART CROP (The Fix)
+        # This forces the heatmap to generate on the FILM, not the WALL.
+        return self.smart_crop_film(img_pil)
+
+    def _render_overlay(self, img_pil, cam, triage_value, save_path, scan_data=None, final_verdict=None):
+        # Convert crop to CV2 for final overlay
+        img_cv = cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
+
+        # Auto brightness (CLAHE is better for medical, but simple scaling works too)
+        if np.mean(img_cv) < 50:
+            img_cv = cv2.convertScaleAbs(img_cv, alpha=1.5, beta=20)
+
+        # Resize CAM to match the CROPPED image size
+        cam = cv2.resize(cam.astype(np.float32), (img_pil.width, img_pil.height))
+        cam[cam < 0.2] = 0  
+
+        try: triage_value = int(triage_value)
+        except: triage_value = 1
+
+        if triage_value >= 3:
+            colormap = cv2.COLORMAP_JET
+            alpha = 0.5
+        else:
+            colormap = cv2.COLORMAP_VIRIDIS
+            alpha = 0.35
+
+        heatmap = cv2.applyColorMap(np.uint8(255 * cam), colormap)
+        overlay = cv2.addWeighted(img_cv, 1 - alpha, heatmap, alpha, 0)
+
+        if self.should_show_disclaimer(scan_data, final_verdict):
+            h, w, _ = overlay.shape
+            text = "AI ATTENTION MAP"
+            font_scale = max(0.6, w / 1200.0)
+            cv2.putText(overlay, text, (20, h - 20), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), 2, cv2.LINE_AA)
+
+        os.makedirs(os.path.dirname(save_path), exist_ok=True)
+        cv2.imwrite(save_path, overlay)
+
+        return {
+            "status": "success", 
+            "overlay_path": save_path, 
+            "score": int(min(10, triage_value * 2.5)), 
+            "description": "AI Visualization generated."
+        }
 
-            # 1. Load Image
+    def generate_heatmap(self, image_path, triage_value=1, save_path="outputs/overlay_output.jpg", scan_data=None, final_verdict=None):
+        return self.generate_heatmaps([{
+            "image_path": image_path, "triage_value": triage_value, "save_path": save_path,
+            "scan_data": scan_data, "final_verdict": final_verdict
+        }])[0]
+
+    def generate_heatmaps(self, jobs):
+        """
+        Batched generate_heatmap: jobs are dicts with the generate_heatmap arguments.
+        All images share one forward and one (head-only) backward pass.
+        """
+        if not self.ai_ready:
+            return [{"status": "error", "message": "AI Model not loaded."} for _ in jobs]
+
+        results = [None] * len(jobs)
+        images, slots = [], []
+        for i, job in enumerate(jobs):
             try:
-                img_pil = Image.open(image_path).convert("RGB")
+                images.append(self._prepare_image(job["image_path"]))
+                slots.append(i)
             except Exception:
-                return {"status": "error", "message": "Invalid image file."}
-
-            # 2. 🟢 APPLY SMART CROP (The Fix)
-            # This forces the heatmap to generate on the FILM, not the WALL.
-            img_pil = self.smart_crop_film(img_pil)
-
-            # Convert crop to CV2 for final overlay
-            img_cv = cv2.cvtColor(np.array(img_pil), cv2.COLOR_RGB2BGR)
-
-            # Auto brightness (CLAHE is better for medical, but simple scaling works too)
-            if np.mean(img_cv) < 50:
-                img_cv = cv2.convertScaleAbs(img_cv, alpha=1.5, beta=20)
+                results[i] = {"status": "error", "message": "Invalid image file."}
 
-            # 3. AI Processing
-            input_tensor = self.preprocess(img_pil).unsqueeze(0).to(self.device)
-            target_layer = self.model.features.norm5
-
-            activations = []
-            gradients = []
-
-            def forward_hook(module, input, output):
-                activations.append(output)
-                output.register_hook(lambda grad: gradients.append(grad))
-
-            handle = target_layer.register_forward_hook(forward_hook)
-            try:
-                output = self.model(input_tensor)
-                target_category = output.argmax(dim=1)
-                self.model.zero_grad()
-                output[0, target_category].backward()
-            finally:
-                handle.remove()
-
-            if not gradients or not activations:
-                return {"status": "error", "message": "Grad-CAM failed."}
-
-            grad = gradients[0].detach().numpy()[0]
-            act = activations[0].detach().numpy()[0]
-            weights = np.mean(grad, axis=(1, 2))
-
-            cam = np.zeros(act.shape[1:], dtype=np.float32)
-            for i, w in enumerate(weights):
-                cam += w * act[i]
-
-            cam = np.maximum(cam, 0)
-            if np.max(cam) > 0:
-                cam /= np.max(cam)
-
-            # Resize CAM to match the CROPPED image size
-            cam = cv2.resize(cam, (img_pil.width, img_pil.height))
-            cam[cam < 0.2] = 0  
-
-            try: triage_value = int(triage_value)
-            except: triage_value = 1
-
-            if triage_value >= 3:
-                colormap = cv2.COLORMAP_JET
-                alpha = 0.5
-            else:
-                colormap = cv2.COLORMAP_VIRIDIS
-                alpha = 0.35
-
-            heatmap = cv2.applyColorMap(np.uint8(255 * cam), colormap)
-            overlay = cv2.addWeighted(img_cv, 1 - alpha, heatmap, alpha, 0)
-
-            if self.should_show_disclaimer(scan_data, final_verdict):
-                h, w, _ = overlay.shape
-                text = "AI ATTENTION MAP"
-                font_scale = max(0.6, w / 1200.0)
-                cv2.putText(overlay, text, (20, h - 20), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), 2, cv2.LINE_AA)
-
-            os.makedirs(os.path.dirname(save_path), exist_ok=True)
-            cv2.imwrite(save_path, overlay)
-
-            return {
-                "status": "success", 
-                "overlay_path": save_path, 
-                "score": int(min(10, triage_value * 2.5)), 
-                "description": "AI Visualization generated."
-            }
+        if not images: return results
 
+        try:
+            cams = self.compute_cams(images)
         except Exception as e:
             traceback.print_exc()
-            return {"status": "error", "message": str(e)}
+            for i in slots: results[i] = {"status": "error", "message": f"Grad-CAM failed: {e}"}
+            return results
+
+        for i, img_pil, cam in zip(slots, images, cams):
+            job = jobs[i]
+            try:
+                results[i] = self._render_overlay(
+                    img_pil, cam, job.get("triage_value", 1), job.get("save_path", "outputs/overlay_output.jpg"),
+                    job.get("scan_data"), job.get("final_verdict")
+                )
+            except Exception as e:
+                traceback.print_exc()
+                results[i] = {"status": "error", "message": str(e)}
+        return results
 
 _lens = None
 def get_magic_lens():
@@ -0,0 +1,76 @@
+import asyncio
+
+# ------------------------------------------------------------------
+# 🧺 MICRO-BATCHING SCHEDULER
+# Concurrent requests are queued for a short window and run through
+# the model as one batch; each caller gets its own result back.
+# ------------------------------------------------------------------
+class MicroBatcher:
+    def __init__(self, batch_fn, max_batch_size=16, max_delay_ms=15, runner=None):
+        """
+        batch_fn: blocking callable, list of items -> list of results (same order)
+        max_batch_size: flush as soon as this many items are queued
+        max_delay_ms: longest a queued item waits for company before flushing
+        runner: optional coroutine fn(batch_fn, items) that decides where the batch runs
+        """
+        self.batch_fn = batch_fn
+        self.runner = runner
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_delay = max(0.0, float(max_delay_ms)) / 1000.0
+        self.batches_run = 0
+        self.items_run = 0
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        # Queue and worker are created lazily so they bind to the server's running loop
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item):
+        """Queues one item and waits for its slot of the batched result."""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0: break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            try:
+                if self.runner: results = await self.runner(self.batch_fn, items)
+                else: results = await loop.run_in_executor(None, self.batch_fn, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done(): future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.items_run += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done(): future.set_result(result)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_delay_ms": self.max_delay * 1000.0,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "batches_run": self.batches_run,
+            "avg_batch_size": round(self.items_run / self.batches_run, 2) if self.batches_run else 0.0,
+        }
@@ -0,0 +1,89 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# ------------------------------------------------------------------
+# ⚙️ STAGE EXECUTORS
+# Keeps blocking pipeline work off the asyncio event loop:
+#   - thread pool  -> file I/O, sqlite, torch inference (releases the GIL)
+#   - process pool -> Tesseract OCR and reportlab rendering (pure CPU)
+# Every call is tagged with a stage name so queue depth can be inspected.
+# Process workers start via forkserver (spawn where unavailable): forking
+# the server would copy its thread pools, torch/OpenMP state and held locks.
+# ------------------------------------------------------------------
+class StageExecutors:
+    def __init__(self, thread_workers=None, process_workers=None, start_method=None):
+        cpus = os.cpu_count() or 2
+        self.thread_workers = int(thread_workers or min(32, cpus + 4))
+        self.process_workers = int(process_workers or max(1, cpus // 2))
+        self.threads = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="medibot-stage")
+        available = multiprocessing.get_all_start_methods()
+        self.start_method = start_method or ("forkserver" if "forkserver" in available else "spawn")
+        self._processes = None
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    @property
+    def processes(self):
+        # Created on first use so importing the API never forks workers by itself
+        if self._processes is None:
+            with self._lock:
+                if self._processes is None:
+                    self._processes = ProcessPoolExecutor(
+                        max_workers=self.process_workers, mp_context=multiprocessing.get_context(self.start_method))
+        return self._processes
+
+    def _stage(self, name):
+        with self._lock:
+            if name not in self._stages:
+                self._stages[name] = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "total_ms": 0.0}
+            return self._stages[name]
+
+    def _update(self, stats, **deltas):
+        with self._lock:
+            for key, delta in deltas.items(): stats[key] += delta
+
+    async def run(self, stage, fn, *args, process=False):
+        """Runs fn(*args) on the thread pool (or the process pool) and awaits its result."""
+        stats = self._stage(stage)
+        self._update(stats, queued=1)
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+
+        if process:
+            # Start time inside a child process is not observable; count it as running on submit
+            self._update(stats, queued=-1, running=1)
+            future = loop.run_in_executor(self.processes, fn, *args)
+        else:
+            def tracked():
+                self._update(stats, queued=-1, running=1)
+                return fn(*args)
+            future = loop.run_in_executor(self.threads, tracked)
+
+        try:
+            result = await future
+        except Exception:
+            self._update(stats, running=-1, failed=1)
+            raise
+        self._update(stats, running=-1, completed=1, total_ms=(time.perf_counter() - start) * 1000.0)
+        return result
+
+    def stats(self):
+        with self._lock:
+            stages = {}
+            for name, s in self._stages.items():
+                stages[name] = {
+                    "queued": s["queued"],
+                    "running": s["running"],
+                    "completed": s["completed"],
+                    "failed": s["failed"],
+                    "avg_ms": round(s["total_ms"] / s["completed"], 1) if s["completed"] else 0.0,
+                }
+        return {"thread_workers": self.thread_workers, "process_workers": self.process_workers, "start_method": self.start_method, "stages": stages}
+
+    def shutdown(self):
+        self.threads.shutdown(wait=False)
+        if self._processes is not None: self._processes.shutdown(wait=False)
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+
+# ------------------------------------------------------------------
+# 🔥 DEFERRED HEATMAP JOBS
+# /analyze answers with the verdict as soon as it is known; heatmaps
+# are rendered afterwards by background tasks, at most
+# `max_concurrency` at a time, and polled through /heatmap/{job_id}.
+# At most `max_pending` jobs wait for a slot; past that, new jobs are
+# recorded as "skipped" instead of queueing without bound.
+# Every status change is also written to `status_dir/<job_id>.json`,
+# so a poll answered by another worker sees the same job.
+# ------------------------------------------------------------------
+def write_status(path, status):
+    # Written whole and renamed into place: a reader never sees half a status
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f: json.dump(status, f)
+    os.replace(tmp_path, path)
+
+def read_status(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f: return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def remove_status(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class HeatmapJobs:
+    def __init__(self, max_concurrency=2, max_pending=32, max_jobs=1000, status_dir=None, runner=None):
+        """
+        max_concurrency: heatmap jobs allowed to run at once (the rest wait, pending)
+        max_pending: jobs allowed to wait; submissions beyond it are skipped (0 = unbounded)
+        max_jobs: finished jobs kept for polling; the oldest are forgotten first
+        status_dir: shared folder for job statuses (None = visible to this process only)
+        runner: optional coroutine fn(fn, *args) that runs the blocking status file I/O
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_pending = max(0, int(max_pending))
+        self.max_jobs = max_jobs
+        self.status_dir = status_dir
+        self.runner = runner
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self._jobs = OrderedDict()
+        self._tasks = {}
+        self._semaphore = None
+        if status_dir: os.makedirs(status_dir, exist_ok=True)
+
+    def _status_path(self, job_id):
+        return os.path.join(self.status_dir, f"{job_id}.json")
+
+    async def _io(self, fn, *args):
+        if self.runner: return await self.runner(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def _save(self, status):
+        if self.status_dir: await self._io(write_status, self._status_path(status["job_id"]), dict(status))
+
+    async def submit(self, job_id, job_fn, **info):
+        """
+        Schedules `await job_fn()` in the background and returns the job's status dict.
+        job_fn returns a dict merged into the status on success (e.g. heatmap_url).
+        When max_pending jobs are already waiting the job is not scheduled: its status is "skipped".
+        """
+        # Created lazily so it binds to the server's running loop
+        if self._semaphore is None: self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        status = {"job_id": job_id, "status": "pending", "created_at": time.time(), **info}
+        self._jobs[job_id] = status
+        skipped = self.max_pending and self.pending() >= self.max_pending
+        if skipped:
+            status["status"] = "skipped"
+            status["finished_at"] = status["created_at"]
+            self.skipped += 1
+            print(f"⚠️ Heatmap queue full ({self.max_pending} pending): skipped {job_id}")
+        else:
+            # Counted as pending from here, while its first status is written
+            self._tasks[job_id] = None
+        # Saved before the task starts, so the job's own updates always land after it
+        await self._save(status)
+        if not skipped:
+            self._tasks[job_id] = asyncio.get_running_loop().create_task(self._run(job_id, job_fn))
+        await self._trim()
+        return dict(status)
+
+    async def _run(self, job_id, job_fn):
+        status = self._jobs[job_id]
+        try:
+            async with self._semaphore:
+                status["status"] = "running"
+                await self._save(status)
+                started = time.perf_counter()
+                result = await job_fn()
+                status.update(result or {})
+                status["status"] = "done"
+                status["time_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+                self.completed += 1
+        except asyncio.CancelledError:
+            # shutdown() has already written the cancelled status
+            status["status"] = "cancelled"
+            self._tasks.pop(job_id, None)
+            raise
+        except Exception as e:
+            print(f"⚠️ Heatmap job {job_id} failed: {e}")
+            status["status"] = "error"
+            status["error"] = str(e)
+            self.failed += 1
+        status["finished_at"] = time.time()
+        try:
+            await self._save(status)
+        except Exception as e:
+            print(f"⚠️ Heatmap job {job_id}: status not saved: {e}")
+        finally:
+            self._tasks.pop(job_id, None)
+
+    async def _trim(self):
+        # Drop the oldest finished jobs once the table is full; running jobs are never dropped
+        if len(self._jobs) <= self.max_jobs: return
+        dropped = []
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs: break
+            if job_id not in self._tasks:
+                del self._jobs[job_id]
+                dropped.append(job_id)
+        if self.status_dir:
+            for job_id in dropped: await self._io(remove_status, self._status_path(job_id))
+
+    def pending(self):
+        return sum(1 for job_id in self._tasks if self._jobs[job_id]["status"] == "pending")
+
+    def active(self, job_id):
+        """True while the job is queued or running in this process."""
+        return job_id in self._tasks
+
+    def read(self, job_id):
+        """Blocking status lookup (this process first, then the shared status file); None if unknown."""
+        status = self._jobs.get(job_id)
+        if status: return dict(status)
+        if self.status_dir: return read_status(self._status_path(job_id))
+        return None
+
+    async def get(self, job_id):
+        status = self._jobs.get(job_id)
+        if status: return dict(status)
+        if self.status_dir: return await self._io(read_status, self._status_path(job_id))
+        return None
+
+    def stats(self):
+        # Counters for this worker's jobs only
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_pending": self.max_pending,
+            "active": len(self._tasks),
+            "pending": self.pending(),
+            "running": sum(1 for s in self._jobs.values() if s["status"] == "running"),
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped": self.skipped,
+        }
+
+    def shutdown(self):
+        # The loop is stopping, so the cancelled statuses are written here, synchronously:
+        # other workers would otherwise report these jobs as pending forever
+        for job_id, task in list(self._tasks.items()):
+            status = self._jobs[job_id]
+            status["status"] = "cancelled"
+            status["finished_at"] = time.time()
+            if self.status_dir: write_status(self._status_path(job_id), dict(status))
+            if task: task.cancel()
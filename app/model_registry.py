@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ------------------------------------------------------------------
+# 🧠 MODEL REGISTRY
+# Models load in background threads so the server accepts connections
+# immediately:
+#   - eager models start loading together at startup (in parallel)
+#   - lazy models load on first request that needs them
+#   - routes await a model; /readyz reports when the eager set is loaded
+# ------------------------------------------------------------------
+class ModelRegistry:
+    def __init__(self, max_workers=4):
+        self._loaders = {}
+        self._eager = []
+        self._futures = {}
+        self._load_ms = {}
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def register(self, name, loader, eager=True):
+        """loader: blocking zero-arg callable returning the model object."""
+        self._loaders[name] = loader
+        if eager: self._eager.append(name)
+
+    def _load(self, name):
+        start = time.perf_counter()
+        model = self._loaders[name]()
+        self._load_ms[name] = round((time.perf_counter() - start) * 1000.0, 1)
+        print(f"✅ Model ready: {name} ({self._load_ms[name]} ms)")
+        return model
+
+    def _future(self, name):
+        # The first caller starts the load; everyone else shares the same future.
+        # A failed load is retried by the next caller instead of failing forever.
+        with self._lock:
+            future = self._futures.get(name)
+            if future is None or (future.done() and future.exception() is not None):
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="medibot-model-load")
+                future = self._futures[name] = self._pool.submit(self._load, name)
+            return future
+
+    def start(self):
+        """Kicks off every eager model concurrently; returns without waiting."""
+        for name in self._eager: self._future(name)
+
+    def load_all(self):
+        """
+        Blocking: loads every registered model (eager and lazy) and re-raises the first failure.
+        The loader threads are joined afterwards, so the process can fork safely
+        (preload mode, see gunicorn.conf.py) and children start their own pool if needed.
+        """
+        for name in self._loaders: self._future(name)
+        loaded = {name: self._future(name).result() for name in self._loaders}
+        self.shutdown(wait=True)
+        return loaded
+
+    async def get(self, name):
+        """Awaits the model, starting its load if nobody has asked for it yet."""
+        return await asyncio.wrap_future(self._future(name))
+
+    def get_sync(self, name):
+        """Blocking variant for code already running on a worker thread."""
+        return self._future(name).result()
+
+    def loaded(self, name):
+        """The model if it has finished loading, else None (never starts a load)."""
+        future = self._futures.get(name)
+        return future.result() if self._state(future) == "ready" else None
+
+    def _state(self, future):
+        if future is None: return "not_loaded"
+        if not future.done(): return "loading"
+        if future.exception() is not None: return "failed"
+        return "ready"
+
+    def ready(self):
+        return all(self._state(self._futures.get(name)) == "ready" for name in self._eager)
+
+    def status(self):
+        models = {}
+        for name in self._loaders:
+            future = self._futures.get(name)
+            entry = {"state": self._state(future), "eager": name in self._eager}
+            if name in self._load_ms: entry["load_ms"] = self._load_ms[name]
+            if entry["state"] == "failed": entry["error"] = str(future.exception())
+            models[name] = entry
+        return {"ready": self.ready(), "models": models}
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None: pool.shutdown(wait=wait)
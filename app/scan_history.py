@@ -0,0 +1,248 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import datetime
+import base64
+
+# ------------------------------------------------------------------
+# 🗄️ SCAN HISTORY PERSISTENCE
+# One long-lived WAL-mode database per worker:
+#   - schema is created once at startup
+#   - record() only enqueues; a background writer groups queued
+#     scans into one transaction (one fsync per batch, not per scan)
+#   - readers get their own connection per thread
+# ------------------------------------------------------------------
+SCANS_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS scans (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        scan_type TEXT,
+        verdict TEXT,
+        severity INTEGER,
+        report_url TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+# Composite indexes back every /history access path with an index range scan;
+# (created_at, id) is the keyset used for pagination
+SCANS_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_scans_user_created ON scans (user_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_scans_user_type_created ON scans (user_id, scan_type, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_scans_user_severity_created ON scans (user_id, severity, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_scans_user_verdict ON scans (user_id, verdict, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_scans_type_created ON scans (scan_type, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_scans_created ON scans (created_at, id)",
+]
+
+SCAN_COLUMNS = ["id", "user_id", "scan_type", "verdict", "severity", "report_url", "created_at"]
+
+# created_at is stored as UTC text in this format (SQLite CURRENT_TIMESTAMP's own)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+INSERT_SCAN = "INSERT INTO scans (user_id, scan_type, verdict, severity, report_url, created_at) VALUES (?, ?, ?, ?, ?, ?)"
+
+DB_FILENAME = "medibot.db"
+
+# Never descend into these while looking for the DB (large scan / output volumes)
+SKIP_DIRS = {"outputs", "temp", "cache", "uploads", "scans", "node_modules", ".git", "venv", ".venv", "medibot_env", "__pycache__"}
+
+def _discover_db(search_root, filename=DB_FILENAME, max_depth=2):
+    """Depth-limited search of sibling project folders for the DB file."""
+    base_depth = search_root.rstrip(os.sep).count(os.sep)
+    for root, dirs, files in os.walk(search_root):
+        if filename in files:
+            return os.path.join(root, filename)
+        if root.count(os.sep) - base_depth >= max_depth:
+            dirs[:] = []
+        else:
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS and not d.startswith(".")]
+    return None
+
+def resolve_db_path(configured=None, filename=DB_FILENAME):
+    """
+    Resolves the scan-history DB once at startup:
+      1. `configured` (MEDIBOT_DB_PATH) - must exist
+      2. ./medibot.db
+      3. one bounded discovery pass over sibling project folders
+    Raises RuntimeError when no DB is found, so a misconfigured worker fails at boot.
+    """
+    if configured:
+        if not os.path.isfile(configured):
+            raise RuntimeError(f"MEDIBOT_DB_PATH points to a missing file: {configured}")
+        return os.path.abspath(configured)
+
+    if os.path.isfile(filename):
+        return os.path.abspath(filename)
+
+    found = _discover_db(os.path.dirname(os.getcwd()), filename)
+    if found:
+        return os.path.abspath(found)
+
+    raise RuntimeError(f"Scan history DB '{filename}' not found. Set MEDIBOT_DB_PATH to its location.")
+
+class ScanHistory:
+    """Repository for the scans table; construct once per worker with a resolved DB path."""
+    def __init__(self, db_path, batch_size=100, flush_interval=0.25):
+        if not os.path.isfile(db_path):
+            raise RuntimeError(f"Scan history DB not found: {db_path}")
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rows_written = 0
+        self.batches_written = 0
+        self._local = threading.local()
+        self._queue = queue.Queue()
+
+        conn = self._connect()
+        conn.execute(SCANS_SCHEMA)
+        for ddl in SCANS_INDEXES: conn.execute(ddl)
+        conn.commit()
+        self._local.conn = conn
+
+        self._writer = threading.Thread(target=self._write_loop, name="scan-history-writer", daemon=True)
+        self._writer.start()
+        print(f"🗄️ Scan history: {db_path}")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def connection(self):
+        """Per-thread read connection (a small pool: one per executor thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # --- WRITES ---
+    def record(self, user_id, scan_type, verdict, severity, report_url):
+        """Queues a scan row; returns immediately."""
+        created_at = datetime.datetime.now(datetime.timezone.utc).strftime(TIMESTAMP_FORMAT)
+        self._queue.put((user_id, scan_type, verdict, severity, report_url, created_at))
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0: break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = self._next_batch()
+            stop = None in batch
+            rows = [row for row in batch if row is not None]
+            if rows: self._write(conn, rows)
+            for _ in batch: self._queue.task_done()
+            if stop: break
+        conn.close()
+
+    def _write(self, conn, rows):
+        for attempt in range(5):
+            try:
+                with conn:
+                    conn.executemany(INSERT_SCAN, rows)
+                self.rows_written += len(rows)
+                self.batches_written += 1
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) and "busy" not in str(e):
+                    print(f"⚠️ Database Save Error: {e}")
+                    return
+                time.sleep(0.1 * (attempt + 1))
+        print(f"⚠️ Database Save Error: gave up on {len(rows)} scans (database is locked)")
+
+    # --- READS ---
+    @staticmethod
+    def encode_cursor(created_at, scan_id):
+        return base64.urlsafe_b64encode(f"{created_at}|{scan_id}".encode("utf-8")).decode("ascii")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            created_at, scan_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit("|", 1)
+            return created_at, int(scan_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+    @staticmethod
+    def parse_timestamp(value, name="timestamp"):
+        """
+        ISO 8601 date or datetime -> stored UTC text, so range filters compare like with like.
+        Naive values are taken as UTC. Raises ValueError on anything else.
+        """
+        try:
+            parsed = datetime.datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+        except (AttributeError, ValueError):
+            raise ValueError(f"Invalid {name}: expected an ISO 8601 date or datetime, got {value!r}")
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(datetime.timezone.utc)
+        return parsed.strftime(TIMESTAMP_FORMAT)
+
+    @staticmethod
+    def _filters(user_id=None, scan_type=None, severity=None, min_severity=None, since=None, until=None):
+        clauses, params = [], []
+        if user_id is not None: clauses.append("user_id = ?"); params.append(user_id)
+        if scan_type is not None: clauses.append("scan_type = ?"); params.append(scan_type)
+        if severity is not None: clauses.append("severity = ?"); params.append(severity)
+        if min_severity is not None: clauses.append("severity >= ?"); params.append(min_severity)
+        if since is not None: clauses.append("created_at >= ?"); params.append(ScanHistory.parse_timestamp(since, "since"))
+        if until is not None: clauses.append("created_at < ?"); params.append(ScanHistory.parse_timestamp(until, "until"))
+        return clauses, params
+
+    def list_scans(self, limit=50, cursor=None, **filters):
+        """
+        Newest-first page of scans. Pagination is keyset-based on (created_at, id):
+        pass the returned next_cursor back to continue; cost does not grow with depth.
+        """
+        limit = max(1, min(int(limit), 500))
+        clauses, params = self._filters(**filters)
+        if cursor:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(self.decode_cursor(cursor))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT {', '.join(SCAN_COLUMNS)} FROM scans {where} ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = self.connection().execute(sql, params + [limit + 1]).fetchall()
+
+        items = [dict(zip(SCAN_COLUMNS, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = self.encode_cursor(last["created_at"], last["id"])
+        return {"items": items, "next_cursor": next_cursor}
+
+    def verdict_counts(self, **filters):
+        """Scan counts grouped by verdict for the same filters as list_scans."""
+        clauses, params = self._filters(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"SELECT verdict, COUNT(*) FROM scans {where} GROUP BY verdict ORDER BY COUNT(*) DESC"
+        counts = {verdict: count for verdict, count in self.connection().execute(sql, params).fetchall()}
+        return {"total": sum(counts.values()), "by_verdict": counts}
+
+    def flush(self):
+        """Blocks until every queued scan has been written."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join(timeout=10)
+
+    def stats(self):
+        return {
+            "db_path": self.db_path,
+            "queued": self._queue.qsize(),
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+        }
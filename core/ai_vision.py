@@ -1,33 +1,125 @@
 import torch
-import open_clip
 import numpy as np
 import cv2
 import json
 import os
+import time
+import hashlib
 from PIL import Image
-from transformers import AutoTokenizer
+from core.image_context import ImageContext, as_image_context
+from core.quantization import quantization_enabled, configure_cpu_threads, quantize_dynamic_int8
+
+VISION_MODEL_NAME = 'hf-hub:microsoft/BiomedCLIP-PubMedBERT_256-vit_base_patch16_224'
+
+# --- BACKEND SELECTION (get_brain) ---
+#   eager       -> open_clip + transformers (default)
+#   torchscript -> exported artifact only (see export_vision_model.py)
+VISION_BACKEND = os.environ.get("MEDIBOT_VISION_BACKEND", "eager").strip().lower()
+VISION_ARTIFACT_DIR = os.environ.get("MEDIBOT_VISION_ARTIFACT", "models/vision_torchscript")
+
+def default_kb_path():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    kb_path = os.path.join(os.path.dirname(base_dir), "Medical_AI_Knowledge_Base")
+    if not os.path.exists(kb_path): kb_path = os.path.join(base_dir, "Medical_AI_Knowledge_Base")
+    return kb_path
+
+def knowledge_base_version(kb_path=None, model_name=VISION_MODEL_NAME):
+    """Fingerprints the model name + KB files, so downstream caches invalidate on edits (no model load needed)."""
+    kb_path = kb_path or default_kb_path()
+    fingerprint = hashlib.sha256(model_name.encode("utf-8"))
+    if os.path.exists(kb_path):
+        for filename in sorted(f for f in os.listdir(kb_path) if f.endswith('.json')):
+            try:
+                with open(os.path.join(kb_path, filename), 'rb') as f:
+                    fingerprint.update(filename.encode("utf-8") + f.read())
+            except OSError: pass
+    return fingerprint.hexdigest()[:16]
+
+class ImageFeatures:
+    """Feature handle for one image: the full frame and its smart-cropped film are each encoded at most once."""
+    def __init__(self, brain, image, context=None):
+        self.brain = brain
+        self.image = image
+        self.context = context
+        self._full = None
+        self._crop_image = None
+        self._crop = None
+
+    @property
+    def source(self):
+        # The context carries the cached model input for the full frame
+        return self.context if self.context is not None else self.image
+
+    @property
+    def full(self):
+        if self._full is None: self._full = self.brain.encode_image(self.source)
+        return self._full
+
+    @property
+    def crop_image(self):
+        if self._crop_image is None:
+            if self.context is not None:
+                # Crop box comes from the context's shared grayscale view and is kept for the heatmap stage
+                self.context.set_crop_box(self.brain.film_box(self.context.gray))
+                self._crop_image = self.context.film
+            else:
+                self._crop_image = self.brain.smart_crop_film(self.image)
+        return self._crop_image
+
+    @property
+    def crop(self):
+        if self._crop is None:
+            # smart_crop_film hands back the original frame when no film is found
+            if self.crop_image is self.image: self._crop = self.full
+            else: self._crop = self.brain.encode_image(self.crop_image)
+        return self._crop
 
 class MedicalVisionBrain:
-    def __init__(self):
+    # --- GATEKEEPER MENU (static, so its text embeddings live in the label bank) ---
+    ALLOWED_TYPES = [
+        "Medical X-Ray Scan", "Computed Tomography (CT) Scan", "MRI Scan", 
+        "Medical Ultrasound", "Dermoscopy Skin Lesion", 
+        "Medical Lab Report Document"
+    ]
+    REJECTED_TYPES = [
+        "Anime Character", "Cartoon", "Selfie", "Face Photo", 
+        "Outdoor Landscape", "Car", "Animal", "Food", "Screenshot", "Random Object"
+    ]
+    LABEL_ENCODE_CHUNK = 64
+    ENCODE_BATCH_SIZE = 32
+
+    def __init__(self, quantize=None):
+        """quantize: True/False, or None to follow MEDIBOT_QUANTIZE (see core/quantization.py)"""
         print("⚡ Initializing Medical Vision Brain...")
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model_name = 'hf-hub:microsoft/BiomedCLIP-PubMedBERT_256-vit_base_patch16_224'
+        self.model_name = VISION_MODEL_NAME
+        self.quantized = quantization_enabled() if quantize is None else bool(quantize)
         
         try:
+            # Imported here so the TorchScript backend never pays for the open_clip/transformers stack
+            import open_clip
+            from transformers import AutoTokenizer
             self.model, _, self.preprocess = open_clip.create_model_and_transforms(self.model_name)
             self.model.to(self.device)
             self.model.eval()
+            if self.device == "cpu": configure_cpu_threads()
+            if self.quantized and self.device == "cpu":
+                # Both towers; the label bank below is then built from the int8 text tower
+                self.model = quantize_dynamic_int8(self.model, self.device)
+            else:
+                self.quantized = False
             self.tokenizer = AutoTokenizer.from_pretrained("microsoft/BiomedNLP-BiomedBERT-base-uncased-abstract")
             print("✅ AI Model Loaded Successfully")
         except Exception as e:
             print(f"❌ AI Load Error: {e}")
             raise e
 
+        self._init_knowledge()
+        self.warm_label_bank()
+
+    def _init_knowledge(self):
         # Load Knowledge Base
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(base_dir)
-        self.kb_path = os.path.join(project_root, "Medical_AI_Knowledge_Base")
-        if not os.path.exists(self.kb_path): self.kb_path = os.path.join(base_dir, "Medical_AI_Knowledge_Base")
+        self.kb_path = default_kb_path()
 
         self.body_parts_map = []       
         self.conditions_db = {}        
@@ -36,9 +128,14 @@ class MedicalVisionBrain:
         self.dermoscopy_list = []
         self.load_knowledge_base()
 
+        # Label-embedding bank: normalized text features keyed by label text
+        self._label_bank = {}
+        self._label_matrices = {}
+
     def load_knowledge_base(self):
+        self.kb_version = knowledge_base_version(self.kb_path, self.model_name)
         if not os.path.exists(self.kb_path): return
-        json_files = [f for f in os.listdir(self.kb_path) if f.endswith('.json')]
+        json_files = sorted(f for f in os.listdir(self.kb_path) if f.endswith('.json'))
         for filename in json_files:
             try:
                 with open(os.path.join(self.kb_path, filename), 'r', encoding='utf-8') as f:
@@ -62,101 +159,209 @@ class MedicalVisionBrain:
                         self.dermoscopy_list.append(l["name"])
                         self.severity_map[l["name"].lower()] = l["severity"]
 
+    def _static_labels(self):
+        labels = self.ALLOWED_TYPES + self.REJECTED_TYPES + self.body_parts_map
+        for conditions in self.conditions_db.values(): labels = labels + conditions
+        return labels + self.ultrasound_list + self.dermoscopy_list + ["Normal", "Abnormal"]
+
+    def warm_label_bank(self):
+        """Encodes every knowledge-base label once so requests only pay for the image tower."""
+        self._encode_labels(self._static_labels())
+        print(f"🧠 Label bank ready: {len(self._label_bank)} labels")
+
+    def _encode_labels(self, label_list):
+        missing = [l for l in dict.fromkeys(label_list) if l not in self._label_bank]
+        for start in range(0, len(missing), self.LABEL_ENCODE_CHUNK):
+            chunk = missing[start:start + self.LABEL_ENCODE_CHUNK]
+            inputs = self.tokenizer(chunk, padding=True, truncation=True, max_length=77, return_tensors="pt").to(self.device)
+            with torch.no_grad():
+                text_features = self.model.encode_text(inputs["input_ids"])
+                text_features /= text_features.norm(dim=-1, keepdim=True)
+            for label, feat in zip(chunk, text_features):
+                self._label_bank[label] = feat
+
+    def _text_features(self, label_list):
+        """Returns the (N x D) normalized text matrix for a label list, encoding unseen labels lazily."""
+        key = tuple(label_list)
+        matrix = self._label_matrices.get(key)
+        if matrix is None:
+            self._encode_labels(label_list)
+            matrix = torch.stack([self._label_bank[l] for l in label_list])
+            self._label_matrices[key] = matrix
+        return matrix
+
+    def _preprocess_image(self, image):
+        return self.preprocess(image)
+
+    def _model_input(self, item):
+        """Preprocessed (3 x H x W) input for a PIL image or an ImageContext (cached on the context)."""
+        if isinstance(item, ImageContext):
+            return item.model_input("vision", lambda: self._preprocess_image(item.pil))
+        return self._preprocess_image(item if item.mode == 'RGB' else item.convert('RGB'))
+
+    def _forward(self, image_input):
+        image_features = self.model.encode_image(image_input)
+        image_features /= image_features.norm(dim=-1, keepdim=True)
+        return image_features
+
+    def encode_images(self, images):
+        """Returns normalized (N x D) image features, running the image tower in real batches."""
+        chunks = []
+        for start in range(0, len(images), self.ENCODE_BATCH_SIZE):
+            batch = images[start:start + self.ENCODE_BATCH_SIZE]
+            image_input = torch.stack([self._model_input(img) for img in batch]).to(self.device)
+            with torch.no_grad():
+                chunks.append(self._forward(image_input))
+        return torch.cat(chunks)
+
+    def encode_image(self, image):
+        """Returns the normalized (1 x D) image features for a PIL image or an ImageContext."""
+        return self.encode_images([image])
+
+    def encode(self, image):
+        """Wraps an image (PIL or ImageContext) in a feature handle that every cascade stage scores against."""
+        if isinstance(image, ImageContext): return ImageFeatures(self, image.pil, image)
+        return ImageFeatures(self, image)
+
+    def _prefill(self, handles, crop=False):
+        """Batch-encodes the full frames (or cropped films) that the handles have not encoded yet."""
+        if crop: pending = [h for h in handles if h._crop is None and h.crop_image is not h.image]
+        else: pending = [h for h in handles if h._full is None]
+        if not pending: return
+        feats = self.encode_images([h.crop_image if crop else h.source for h in pending])
+        for h, f in zip(pending, feats.split(1)):
+            if crop: h._crop = f
+            else: h._full = f
+
+    def _score(self, image_features, label_list):
+        """Scores (N x D) image features against one label list in a single matmul -> (N x L) probs."""
+        text_features = self._text_features(label_list)
+        with torch.no_grad():
+            return (100.0 * image_features @ text_features.T).softmax(dim=-1)
+
     def _get_probs(self, image, label_list):
+        """Scores a PIL image or precomputed image features against a label list."""
         if not label_list: return [0.0]
-        if image.mode != 'RGB': image = image.convert('RGB')
-        
-        image_input = self.preprocess(image).unsqueeze(0).to(self.device)
-        inputs = self.tokenizer(label_list, padding=True, truncation=True, max_length=77, return_tensors="pt").to(self.device)
-        
-        with torch.no_grad():
-            image_features = self.model.encode_image(image_input)
-            text_features = self.model.encode_text(inputs["input_ids"])
-            image_features /= image_features.norm(dim=-1, keepdim=True)
-            text_features /= text_features.norm(dim=-1, keepdim=True)
-            text_probs = (100.0 * image_features @ text_features.T).softmax(dim=-1)
-            
-        return text_probs[0].tolist()
+        image_features = self.encode_image(image) if isinstance(image, (Image.Image, ImageContext)) else image
+        return self._score(image_features, label_list)[0].tolist()
 
-    def smart_crop_film(self, pil_image):
+    def film_box(self, gray):
+        """Bounding box (x0, y0, x1, y1) of the largest film-like contour in a grayscale array, or None."""
         try:
-            img_cv = cv2.cvtColor(np.array(pil_image), cv2.COLOR_RGB2BGR)
-            gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
             blurred = cv2.GaussianBlur(gray, (5, 5), 0)
             edged = cv2.Canny(blurred, 50, 200)
             contours, _ = cv2.findContours(edged, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            if not contours: return pil_image
+            if not contours: return None
             c = max(contours, key=cv2.contourArea)
             x, y, w, h = cv2.boundingRect(c)
-            if w < 100 or h < 100: return pil_image
-            return pil_image.crop((x, y, x+w, y+h))
+            if w < 100 or h < 100: return None
+            return (x, y, x+w, y+h)
+        except: return None
+
+    def smart_crop_film(self, pil_image):
+        try: box = self.film_box(cv2.cvtColor(np.asarray(pil_image.convert("RGB")), cv2.COLOR_RGB2GRAY))
         except: return pil_image
+        return pil_image.crop(box) if box else pil_image
 
     def analyze_image(self, image_path):
-        try:
-            original_image = Image.open(image_path).convert("RGB")
-        except:
-            return {"label": "Error", "triage": 0, "modality": "Invalid", "findings": {"assessment": "File Error"}}
-        
+        return self.analyze_images([image_path])[0]
+
+    def analyze_images(self, image_paths):
+        """Batched analyze_image: one result per path or ImageContext, identical to the per-image call."""
+        results = [None] * len(image_paths)
+        handles, slots = [], []
+        for i, image_path in enumerate(image_paths):
+            try:
+                context = as_image_context(image_path)
+                context.pil  # decode now so a corrupt file is reported here
+            except:
+                results[i] = {"label": "Error", "triage": 0, "modality": "Invalid", "findings": {"assessment": "File Error"}}
+                continue
+            handles.append(self.encode(context))
+            slots.append(i)
+        for i, result in zip(slots, self.analyze_batch(handles)):
+            results[i] = result
+        return results
+
+    def analyze_features(self, features):
+        return self.analyze_batch([features])[0]
+
+    def analyze_batch(self, handles):
+        """Runs the cascade over many feature handles; each stage encodes and scores the whole batch at once."""
+        results = [None] * len(handles)
+        if not handles: return results
+
         # --- 1. STRICT GATEKEEPER ---
-        allowed_types = [
-            "Medical X-Ray Scan", "Computed Tomography (CT) Scan", "MRI Scan", 
-            "Medical Ultrasound", "Dermoscopy Skin Lesion", 
-            "Medical Lab Report Document"
-        ]
-        rejected_types = [
-            "Anime Character", "Cartoon", "Selfie", "Face Photo", 
-            "Outdoor Landscape", "Car", "Animal", "Food", "Screenshot", "Random Object"
-        ]
-        
-        all_checks = allowed_types + rejected_types
-        probs = self._get_probs(original_image, all_checks)
-        best_idx = probs.index(max(probs))
-        detected_type = all_checks[best_idx]
-        confidence = max(probs)
-
-        # REJECTION LOGIC
-        if detected_type in rejected_types:
-            print(f"❌ REJECTED: Detected {detected_type}")
-            return {
-                "label": "Non-Medical Image",
-                "triage": 0, 
-                "modality": "Invalid",
-                "findings": {"assessment": "Rejected", "reason": f"Image identified as {detected_type}"}
-            }
-        
-        if confidence < 0.35:
-            return {
-                "label": "Unclear Image",
-                "triage": 0,
-                "modality": "Invalid",
-                "findings": {"assessment": "Rejected", "reason": "Low confidence match."}
-            }
-
-        # Document Routing
-        if "Lab Report" in detected_type:
-             return {"label": "Lab Report", "triage": 1, "modality": "Document", "findings": {"assessment": "OCR Required"}}
-
-        # --- 2. DIAGNOSIS ---
-        analysis_image = self.smart_crop_film(original_image)
-        
-        final_diagnosis_list = []
-        scan_type_label = detected_type
+        rejected_types = self.REJECTED_TYPES
+        all_checks = self.ALLOWED_TYPES + rejected_types
+        self._prefill(handles)
+        gate_probs = self._score(torch.cat([h.full for h in handles]), all_checks).tolist()
 
-        if "Ultrasound" in detected_type:
-            final_diagnosis_list = self.ultrasound_list
-        elif "Dermoscopy" in detected_type:
-            final_diagnosis_list = self.dermoscopy_list
-        else:
-            mod_key = detected_type.split()[0] if " " in detected_type else detected_type
-            filtered_contexts = [k for k in self.body_parts_map if mod_key in k]
-            if not filtered_contexts: filtered_contexts = self.body_parts_map
-            
-            part_probs = self._get_probs(analysis_image, filtered_contexts)
-            scan_type_label = filtered_contexts[part_probs.index(max(part_probs))]
-            final_diagnosis_list = self.conditions_db.get(scan_type_label, ["Normal", "Abnormal"])
-
-        diag_probs = self._get_probs(analysis_image, final_diagnosis_list)
+        scans = []
+        for i, probs in enumerate(gate_probs):
+            best_idx = probs.index(max(probs))
+            detected_type = all_checks[best_idx]
+            confidence = max(probs)
+
+            # REJECTION LOGIC
+            if detected_type in rejected_types:
+                print(f"❌ REJECTED: Detected {detected_type}")
+                results[i] = {
+                    "label": "Non-Medical Image",
+                    "triage": 0, 
+                    "modality": "Invalid",
+                    "findings": {"assessment": "Rejected", "reason": f"Image identified as {detected_type}"}
+                }
+            elif confidence < 0.35:
+                results[i] = {
+                    "label": "Unclear Image",
+                    "triage": 0,
+                    "modality": "Invalid",
+                    "findings": {"assessment": "Rejected", "reason": "Low confidence match."}
+                }
+            # Document Routing
+            elif "Lab Report" in detected_type:
+                results[i] = {"label": "Lab Report", "triage": 1, "modality": "Document", "findings": {"assessment": "OCR Required"}}
+            else:
+                scans.append((i, detected_type))
+
+        # --- 2. DIAGNOSIS (scored against the cropped film) ---
+        self._prefill([handles[i] for i, _ in scans], crop=True)
+        detected_types = dict(scans)
+        diagnosis_menus = {}   # image index -> (scan_type_label, final_diagnosis_list)
+        part_groups = {}       # body-part context list -> image indices
+
+        for i, detected_type in scans:
+            if "Ultrasound" in detected_type:
+                diagnosis_menus[i] = (detected_type, self.ultrasound_list or ["Normal", "Abnormal"])
+            elif "Dermoscopy" in detected_type:
+                diagnosis_menus[i] = (detected_type, self.dermoscopy_list or ["Normal", "Abnormal"])
+            else:
+                mod_key = detected_type.split()[0] if " " in detected_type else detected_type
+                filtered_contexts = [k for k in self.body_parts_map if mod_key in k]
+                if not filtered_contexts: filtered_contexts = self.body_parts_map
+                part_groups.setdefault(tuple(filtered_contexts), []).append(i)
+
+        for contexts, idxs in part_groups.items():
+            if not contexts:
+                for i in idxs: diagnosis_menus[i] = (detected_types[i], ["Normal", "Abnormal"])
+                continue
+            part_probs = self._score(torch.cat([handles[i].crop for i in idxs]), list(contexts)).tolist()
+            for i, probs in zip(idxs, part_probs):
+                scan_type_label = contexts[probs.index(max(probs))]
+                diagnosis_menus[i] = (scan_type_label, self.conditions_db.get(scan_type_label, ["Normal", "Abnormal"]))
+
+        diag_groups = {}
+        for i, (_, final_diagnosis_list) in diagnosis_menus.items():
+            diag_groups.setdefault(tuple(final_diagnosis_list), []).append(i)
+
+        for diagnosis_list, idxs in diag_groups.items():
+            diag_probs = self._score(torch.cat([handles[i].crop for i in idxs]), list(diagnosis_list)).tolist()
+            for i, probs in zip(idxs, diag_probs):
+                results[i] = self._diagnosis_result(detected_types[i], diagnosis_menus[i][0], diagnosis_list, probs)
+        return results
+
+    def _diagnosis_result(self, detected_type, scan_type_label, final_diagnosis_list, diag_probs):
         best_condition = final_diagnosis_list[diag_probs.index(max(diag_probs))]
         
         # 🟢 REALISM FIX: Calculate confidence with a clamp
@@ -179,8 +384,134 @@ class MedicalVisionBrain:
             "findings": {"confidence": f"{diag_conf}%", "assessment": "Abnormal" if triage_score > 1 else "Normal"}
         }
 
+    def preprocess_config(self):
+        """Resize / crop / normalize parameters of the open_clip transform, for exporters."""
+        config = {"size": 224, "interpolation": "bicubic", "mean": None, "std": None}
+        for t in getattr(self.preprocess, "transforms", []):
+            name = type(t).__name__
+            if name == "Resize":
+                size = t.size
+                config["resize"] = size if isinstance(size, int) else list(size)
+                config["interpolation"] = str(getattr(t.interpolation, "value", t.interpolation)).lower()
+            elif name == "CenterCrop":
+                config["size"] = int(t.size[0] if isinstance(t.size, (list, tuple)) else t.size)
+            elif name == "Normalize":
+                config["mean"], config["std"] = [float(v) for v in t.mean], [float(v) for v in t.std]
+        config.setdefault("resize", config["size"])
+        return config
+
+class _NormalizedImageEncoder(torch.nn.Module):
+    """encode_image + L2 normalization, the exact features the cascade scores with."""
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixels):
+        features = self.model.encode_image(pixels)
+        return features / features.norm(dim=-1, keepdim=True)
+
+def export_torchscript(brain, out_dir=VISION_ARTIFACT_DIR):
+    """
+    Writes a self-contained artifact for CompiledVisionBrain:
+      image_encoder.pt  traced + frozen image tower (normalized features)
+      label_bank.pt     every knowledge-base label embedding
+      metadata.json     model / KB versions and the preprocess parameters
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    config = brain.preprocess_config()
+    example = torch.zeros(2, 3, config["size"], config["size"], device=brain.device)
+
+    with torch.no_grad():
+        traced = torch.jit.trace(_NormalizedImageEncoder(brain.model).eval(), example, check_trace=False)
+        traced = torch.jit.freeze(traced)
+        try: traced = torch.jit.optimize_for_inference(traced)
+        except Exception as e: print(f"⚠️ optimize_for_inference skipped: {e}")
+    traced.save(os.path.join(out_dir, "image_encoder.pt"))
+
+    labels = list(dict.fromkeys(brain._static_labels()))
+    brain._encode_labels(labels)
+    torch.save({"labels": labels, "features": torch.stack([brain._label_bank[l] for l in labels]).cpu()},
+               os.path.join(out_dir, "label_bank.pt"))
+
+    metadata = {
+        "model_name": brain.model_name,
+        "kb_version": brain.kb_version,
+        "quantized": brain.quantized,
+        "preprocess": config,
+        "torch_version": torch.__version__,
+    }
+    with open(os.path.join(out_dir, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadata, f, indent=2)
+    print(f"📦 Vision artifact written to {out_dir} ({len(labels)} labels)")
+    return metadata
+
+class CompiledVisionBrain(MedicalVisionBrain):
+    """
+    Same cascade as MedicalVisionBrain, served from an export_torchscript artifact:
+    no open_clip / transformers import, numpy + PIL preprocessing, frozen TorchScript graph.
+    """
+    RESAMPLE = {"bicubic": Image.BICUBIC, "bilinear": Image.BILINEAR, "nearest": Image.NEAREST}
+
+    def __init__(self, artifact_dir=VISION_ARTIFACT_DIR):
+        print(f"⚡ Initializing Medical Vision Brain (TorchScript: {artifact_dir})...")
+        start = time.perf_counter()
+        self.device = "cpu"
+        configure_cpu_threads()
+        with open(os.path.join(artifact_dir, "metadata.json"), "r", encoding="utf-8") as f:
+            self.metadata = json.load(f)
+        self.model_name = self.metadata["model_name"]
+        self.quantized = self.metadata.get("quantized", False)
+        self.encoder = torch.jit.load(os.path.join(artifact_dir, "image_encoder.pt"), map_location=self.device)
+
+        config = self.metadata["preprocess"]
+        self.image_size = config["size"]
+        self.resize = config.get("resize", self.image_size)
+        self.resample = self.RESAMPLE.get(config.get("interpolation", "bicubic"), Image.BICUBIC)
+        self.mean = np.array(config["mean"], dtype=np.float32).reshape(3, 1, 1)
+        self.std = np.array(config["std"], dtype=np.float32).reshape(3, 1, 1)
+
+        self._init_knowledge()
+        if self.metadata.get("kb_version") != self.kb_version:
+            print("⚠️ Knowledge base changed since export: re-run export_vision_model.py")
+        bank = torch.load(os.path.join(artifact_dir, "label_bank.pt"), map_location=self.device)
+        for label, feat in zip(bank["labels"], bank["features"]):
+            self._label_bank[label] = feat
+        print(f"✅ TorchScript vision brain ready in {(time.perf_counter() - start) * 1000.0:.0f} ms ({len(self._label_bank)} labels)")
+
+    def _encode_labels(self, label_list):
+        # There is no text tower here: every scored label has to come from the exported bank
+        missing = [l for l in dict.fromkeys(label_list) if l not in self._label_bank]
+        if missing:
+            raise KeyError(f"Labels missing from the exported label bank (re-export): {missing[:5]}")
+
+    def _preprocess_image(self, image):
+        return torch.from_numpy(self._preprocess(image))
+
+    def _forward(self, image_input):
+        return self.encoder(image_input)
+
+    def _preprocess(self, image):
+        """numpy/PIL port of the open_clip transform: shortest-side resize, center crop, normalize."""
+        w, h = image.size
+        if isinstance(self.resize, int):
+            if w <= h: new_size = (self.resize, int(self.resize * h / w))
+            else: new_size = (int(self.resize * w / h), self.resize)
+        else:
+            new_size = (self.resize[1], self.resize[0])
+        image = image.resize(new_size, self.resample)
+
+        w, h = image.size
+        top = int(round((h - self.image_size) / 2.0))
+        left = int(round((w - self.image_size) / 2.0))
+        image = image.crop((left, top, left + self.image_size, top + self.image_size))
+
+        pixels = np.asarray(image, dtype=np.float32).transpose(2, 0, 1) / 255.0
+        return (pixels - self.mean) / self.std
+
 _brain = None
 def get_brain():
     global _brain
-    if _brain is None: _brain = MedicalVisionBrain()
+    if _brain is None:
+        if VISION_BACKEND == "torchscript": _brain = CompiledVisionBrain()
+        else: _brain = MedicalVisionBrain()
     return _brain
\ No newline at end of file
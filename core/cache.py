@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# ------------------------------------------------------------------
+# OPTIONAL METADATA (NOT USED IN LOGIC)
+# ------------------------------------------------------------------
+CACHE_ENGINE_VERSION = "1.0.0"
+
+# --- 1. IN-MEMORY TIER ---
+class LRUCache:
+    """Thread-safe LRU bounded by entry count and total value size (bytes)."""
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None: self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        size = len(value)
+        if size > self.max_bytes: return
+        with self._lock:
+            if key in self._data: self.total_bytes -= len(self._data.pop(key))
+            self._data[key] = value
+            self.total_bytes += size
+            while len(self._data) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def __len__(self):
+        return len(self._data)
+
+# --- 2. ON-DISK TIER ---
+class DiskCache:
+    """One file per key under `directory`; oldest-used files are evicted past `max_bytes`."""
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.total_bytes = sum(e.stat().st_size for e in os.scandir(directory) if e.is_file())
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f: value = f.read()
+            os.utime(path)  # mark as recently used for eviction
+            return value
+        except OSError:
+            return None
+
+    def put(self, key, value):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f: f.write(value)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self.total_bytes += len(value.encode("utf-8"))
+            if self.total_bytes > self.max_bytes: self._evict()
+
+    def _evict(self):
+        # Rescan so files written by other workers are accounted for too
+        entries = []
+        for e in os.scandir(self.directory):
+            if e.is_file():
+                st = e.stat()
+                entries.append((st.st_mtime, st.st_size, e.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target: break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self.total_bytes = total
+
+# --- 3. SHARED SQLITE TIER ---
+class SqliteCache:
+    """
+    LRU cache in a sqlite file, bounded by entry count and total value size (bytes).
+    Every worker process opening the same file shares its entries.
+    """
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS cache (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL
+        )
+    '''
+
+    def __init__(self, path, max_entries=4096, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory: os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(self.SCHEMA)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_used ON cache (last_used)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def get(self, key):
+        conn = self._conn()
+        try:
+            row = conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None: return None
+            with conn: conn.execute("UPDATE cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+        except sqlite3.OperationalError:
+            return None  # a busy shared cache is a miss, never an error
+
+    def put(self, key, value):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes: return
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO cache (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                             (key, value, size, time.time()))
+                self._evict(conn)
+        except sqlite3.OperationalError as e:
+            print(f"⚠️ Cache write skipped: {e}")
+
+    def _evict(self, conn):
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes: return
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY last_used"):
+            if count <= self.max_entries and total <= self.max_bytes: break
+            victims.append((key,))
+            count -= 1
+            total -= size
+        conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    @property
+    def total_bytes(self):
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+
+# --- 4. TIERED JSON CACHE ---
+class TieredCache:
+    """Memory LRU in front of a disk tier; values are JSON-serializable dicts."""
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, key):
+        """Same lookup as get, left out of the hit / miss stats (for bookkeeping reads)."""
+        raw = self.memory.get(key)
+        if raw is None and self.disk is not None:
+            raw = self.disk.get(key)
+            if raw is not None: self.memory.put(key, raw)
+        return json.loads(raw) if raw is not None else None
+
+    def get(self, key):
+        value = self.peek(key)
+        if value is None: self.misses += 1
+        else: self.hits += 1
+        return value
+
+    def put(self, key, value):
+        raw = json.dumps(value, default=str)
+        self.memory.put(key, raw)
+        if self.disk is not None: self.disk.put(key, raw)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.total_bytes,
+            "disk_bytes": self.disk.total_bytes if self.disk is not None else 0,
+        }
@@ -1,11 +1,13 @@
-import os, sys, re, fitz
+import os, sys, re, time, threading, multiprocessing, fitz
 import numpy as np
 import pytesseract
 import cv2
 from pathlib import Path
-from typing import List, Tuple
-from pdf2image import convert_from_path
+from typing import List, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 from PIL import Image
+from core.image_context import ImageContext
 
 # ------------------------------------------------------------------
 # OPTIONAL METADATA (NOT USED IN LOGIC)
@@ -14,9 +16,17 @@ OCR_ENGINE_VERSION = "1.0.0"
 OCR_ENGINE_NAME = "MixedPDFTextExtractor"
 
 # ... [Keep your path variables] ...
-POPPLER_PATH = r"C:\poppler\Library\bin\poppler-25.11.0\Library\bin"
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
+# ------------------------------------------------------------------
+# SCANNED-PDF OCR LIMITS (0 = auto / unlimited)
+# ------------------------------------------------------------------
+OCR_MAX_WORKERS = int(os.environ.get("MEDIBOT_OCR_MAX_WORKERS", "0")) or max(1, (os.cpu_count() or 2) - 1)
+OCR_MAX_PAGES = int(os.environ.get("MEDIBOT_OCR_MAX_PAGES", "0"))
+OCR_TIMEOUT_SEC = float(os.environ.get("MEDIBOT_OCR_TIMEOUT_SEC", "0"))
+OCR_DPI = 300
+NATIVE_TEXT_MIN_CHARS = 50  # below this a page is treated as scanned
+
 # ------------------------------------------------------------------
 def is_gibberish(text: str, threshold: float = 0.30) -> bool:
     if not text.strip():
@@ -43,52 +53,188 @@ def preprocess_image(pil_img: Image.Image) -> Image.Image:
         return pil_img
 
 # ------------------------------------------------------------------
-def extract_text_from_pdf_with_mixed_strategy(path: Path) -> Tuple[str, float]:
+def render_pdf_page(doc, page_index: int, dpi: int = OCR_DPI) -> Image.Image:
+    """Rasterizes a single page; only the pages in flight are ever held in memory."""
+    zoom = dpi / 72.0
+    pix = doc[page_index].get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+def ocr_page(pil_img: Image.Image) -> str:
+    return pytesseract.image_to_string(preprocess_image(pil_img))
+
+def ocr_pdf_page(path: str, page_index: int, dpi: int = OCR_DPI) -> str:
+    """Render -> preprocess -> OCR for one page, so workers receive a page number, not pixels."""
+    with fitz.open(path) as doc:
+        img = render_pdf_page(doc, page_index, dpi)
+    return ocr_page(img)
+
+def ocr_pdf_page_in_worker(path: str, page_index: int) -> str:
+    # Some OCR exceptions (e.g. TesseractNotFoundError) cannot be unpickled in the parent,
+    # which would break the whole pool; send back a plain RuntimeError instead
     try:
-        doc = fitz.open(str(path))
+        return ocr_pdf_page(path, page_index)
+    except Exception as e:
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
 
-        native_text = "\n\n".join(
-            [page.get_text("text").strip()
-             for page in doc
-             if page.get_text("text").strip()]
-        )
+_page_pool = None
+_page_pool_lock = threading.Lock()
+def get_page_pool() -> ProcessPoolExecutor:
+    # One pool per server process, started via forkserver (never forks a threaded server)
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _page_pool = ProcessPoolExecutor(max_workers=OCR_MAX_WORKERS, mp_context=multiprocessing.get_context(method))
+    return _page_pool
 
-        if len(native_text) > 50 and not is_gibberish(native_text):
-            return native_text, 0.99
+def reset_page_pool(pool: ProcessPoolExecutor):
+    """Drops a broken pool (a worker died) so the next document starts a fresh one."""
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is pool:
+            _page_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
 
-        print(f"OCR Triggered for {path.name}...")
+def in_worker_process() -> bool:
+    """True inside a pool worker (e.g. the API's stage process pool), where no nested pool is started."""
+    return multiprocessing.parent_process() is not None
 
-        images = convert_from_path(
-            str(path),
-            dpi=300,
-            poppler_path=POPPLER_PATH
-        )
+# ------------------------------------------------------------------
+def ocr_pdf_pages(path: str, page_indices: List[int], timeout: float = 0) -> List[Union[str, Exception, None]]:
+    """
+    OCRs pages across the page pool; one result per page index, in order.
+    A page that fails comes back as its exception, so one bad page never costs the others;
+    a page not OCRed before the deadline comes back as None.
+    At most OCR_MAX_WORKERS pages of this document are in flight at once, so a long scan
+    never queues all its pages ahead of other documents sharing the pool.
+    """
+    deadline = time.monotonic() + timeout if timeout else None
+    expired = lambda: deadline is not None and time.monotonic() > deadline
+    results = [None] * len(page_indices)
+
+    if OCR_MAX_WORKERS <= 1 or len(page_indices) <= 1 or in_worker_process():
+        for i, page_index in enumerate(page_indices):
+            if expired():
+                print(f"OCR timeout after {timeout}s: kept {i}/{len(page_indices)} pages")
+                break
+            try:
+                results[i] = ocr_pdf_page(path, page_index)
+            except Exception as e:
+                results[i] = e
+        return results
 
-        all_texts = []
+    pool = get_page_pool()
+    in_flight = {}
+    next_i = 0
+    broken = False
+    while next_i < len(page_indices) or in_flight:
+        # Top the window up as pages finish; nothing new is submitted past the deadline
+        while next_i < len(page_indices) and len(in_flight) < OCR_MAX_WORKERS and not expired():
+            in_flight[pool.submit(ocr_pdf_page_in_worker, path, page_indices[next_i])] = next_i
+            next_i += 1
+        if not in_flight: break
 
-        # OPTIONAL SAFETY LIMIT (NOT ENFORCED)
-        # for img in images[:10]:  # Uncomment if needed
-        for img in images:
-            prep = preprocess_image(img)
-            txt = pytesseract.image_to_string(prep)
-            all_texts.append(txt)
+        remaining = max(0.0, deadline - time.monotonic()) if deadline else None
+        done, _ = wait(in_flight, timeout=remaining, return_when=FIRST_COMPLETED)
+        if not done:
+            # Pages still running finish in the background; their text is dropped
+            print(f"OCR timeout after {timeout}s: kept {sum(r is not None for r in results)}/{len(page_indices)} pages")
+            break
+        for future in done:
+            i = in_flight.pop(future)
+            try:
+                results[i] = future.result()
+            except BrokenProcessPool as e:
+                results[i] = e
+                broken = True
+            except Exception as e:
+                results[i] = e
+        if broken:
+            # A dead worker fails every page in flight; the remaining pages are not submitted
+            print(f"OCR page pool broken: {sum(isinstance(r, str) for r in results)}/{len(page_indices)} pages OCRed")
+            reset_page_pool(pool)
+            break
+    return results
 
-        return "\n\n".join(all_texts), 0.85
+# ------------------------------------------------------------------
+def extract_pdf_pages(path: Path) -> List[dict]:
+    """
+    Per-page hybrid extraction: pages with usable native text keep it,
+    only the remaining (scanned) pages are rendered and OCRed.
+    Returns one dict per page: {page, source, confidence, text} (+ error)
+    source: "native" | "ocr" | "skipped" (page cap / timeout) | "error" (OCR failed on that page)
+    A short native text layer is kept on any OCR candidate whose OCR fails, is skipped or comes back empty.
+    """
+    pages = []
+    ocr_indices = []
+    with fitz.open(str(path)) as doc:
+        for i, page in enumerate(doc):
+            native = page.get_text("text").strip()
+            if len(native) > NATIVE_TEXT_MIN_CHARS and not is_gibberish(native):
+                pages.append({"page": i + 1, "source": "native", "confidence": 0.99, "text": native})
+            else:
+                fallback = native if native and not is_gibberish(native) else ""
+                pages.append({"page": i + 1, "source": "skipped", "confidence": 0.5 if fallback else 0.0, "text": fallback})
+                ocr_indices.append(i)
+
+    if not ocr_indices:
+        return pages
+
+    print(f"OCR Triggered for {path.name}: {len(ocr_indices)}/{len(pages)} pages")
+
+    # SAFETY LIMIT: per-document page cap (OCR_MAX_PAGES)
+    if OCR_MAX_PAGES and len(ocr_indices) > OCR_MAX_PAGES:
+        print(f"OCR page cap: processing {OCR_MAX_PAGES}/{len(ocr_indices)} pages")
+        ocr_indices = ocr_indices[:OCR_MAX_PAGES]
+
+    # Pages without a result (timeout) stay marked as skipped
+    for page_index, txt in zip(ocr_indices, ocr_pdf_pages(str(path), ocr_indices, timeout=OCR_TIMEOUT_SEC)):
+        page = pages[page_index]
+        if txt is None:
+            continue
+        if isinstance(txt, Exception):
+            print(f"OCR failed on page {page['page']} of {path.name}: {txt}")
+            page.update({"source": "error", "error": str(txt)})
+        elif txt.strip() or not page["text"]:
+            page.update({"source": "ocr", "confidence": 0.85, "text": txt.strip()})
+        else:
+            page["source"] = "native"  # OCR found nothing: the short native text stays
+
+    return pages
+
+# ------------------------------------------------------------------
+def extract_text_from_pdf_with_mixed_strategy(path: Path) -> Tuple[str, float, List[dict]]:
+    """Returns (text, confidence, pages); pages is the per-page provenance from extract_pdf_pages."""
+    try:
+        pages = extract_pdf_pages(path)
+        if not pages:
+            return "", 0.0, []
+
+        text = "\n\n".join(p["text"] for p in pages if p["text"])
+        conf = sum(p["confidence"] for p in pages) / len(pages)
+        return text, round(conf, 2), pages
 
     except Exception as e:
-        return f"OCR Error: {str(e)}", 0.0
+        return f"OCR Error: {str(e)}", 0.0, []
 
 # ------------------------------------------------------------------
-def convert_any_to_text(filepath: str) -> Tuple[str, float, str]:
-    p = Path(filepath)
+def convert_any_to_text_detailed(filepath: Union[str, ImageContext]) -> dict:
+    """
+    Like convert_any_to_text, plus provenance: {path, confidence, text, pages}
+    pages: one {page, source, confidence, chars} entry per PDF page (empty for images)
+    """
+    # An ImageContext (image uploads) carries its bytes, so the file is not read again
+    context = filepath if isinstance(filepath, ImageContext) else None
+    p = Path(context.path if context else filepath)
     suffix = p.suffix.lower()
+    pages = []
 
     if suffix == '.pdf':
-        text, conf = extract_text_from_pdf_with_mixed_strategy(p)
+        text, conf, pages = extract_text_from_pdf_with_mixed_strategy(p)
 
     elif suffix in ['.jpg', '.jpeg', '.png', '.webp']:
         try:  # SAFE IMAGE LOAD (ADDED)
-            img = Image.open(p)
+            img = context.pil if context else Image.open(p)
             text = pytesseract.image_to_string(preprocess_image(img))
             conf = 0.90
         except Exception as e:
@@ -98,4 +244,13 @@ def convert_any_to_text(filepath: str) -> Tuple[str, float, str]:
     else:
         text, conf = "Unsupported format", 0.0
 
-    return str(p), conf, text
+    pages = [
+        {"page": pg["page"], "source": pg["source"], "confidence": pg["confidence"], "chars": len(pg["text"]),
+         **({"error": pg["error"]} if "error" in pg else {})}
+        for pg in pages
+    ]
+    return {"path": str(p), "confidence": conf, "text": text, "pages": pages}
+
+def convert_any_to_text(filepath: Union[str, ImageContext]) -> Tuple[str, float, str]:
+    result = convert_any_to_text_detailed(filepath)
+    return result["path"], result["confidence"], result["text"]
@@ -1,7 +1,15 @@
 # core/handwriting.py
-from transformers import TrOCRProcessor, VisionEncoderDecoderModel
-from PIL import Image
+from transformers import TrOCRProcessor, VisionEncoderDecoderModel, LogitsProcessor, LogitsProcessorList
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+import cv2
 import torch
+from core.cache import LRUCache, SqliteCache, TieredCache
+from core.image_context import as_image_context
 
 # ------------------------------------------------------------------
 # OPTIONAL METADATA (NOT USED IN LOGIC)
@@ -9,10 +17,67 @@ import torch
 HANDWRITING_ENGINE_VERSION = "1.0.0"
 HANDWRITING_MODEL_NAME = "microsoft/trocr-small-handwritten"
 
-class HandwritingBrain:
+# ------------------------------------------------------------------
+# DECODING BUDGET (per image; 0 = no wall-clock limit)
+#   num_beams=1 is greedy decoding; early stopping only applies to beams
+# ------------------------------------------------------------------
+HANDWRITING_MAX_NEW_TOKENS = int(os.environ.get("MEDIBOT_HANDWRITING_MAX_NEW_TOKENS", "64"))
+HANDWRITING_NUM_BEAMS = int(os.environ.get("MEDIBOT_HANDWRITING_NUM_BEAMS", "1"))
+HANDWRITING_EARLY_STOPPING = os.environ.get("MEDIBOT_HANDWRITING_EARLY_STOPPING", "1") == "1"
+HANDWRITING_TIMEOUT_SEC = float(os.environ.get("MEDIBOT_HANDWRITING_TIMEOUT_SEC", "20"))
+
+# ------------------------------------------------------------------
+# RE-READ CACHE (keyed by image content hash + decoding config)
+#   memory -> per-process LRU
+#   sqlite -> per-process LRU in front of a file shared by all workers
+#   off    -> no cache
+# ------------------------------------------------------------------
+HANDWRITING_CACHE = os.environ.get("MEDIBOT_HANDWRITING_CACHE", "memory").strip().lower()
+HANDWRITING_CACHE_PATH = os.environ.get("MEDIBOT_HANDWRITING_CACHE_PATH", "cache/handwriting.db")
+HANDWRITING_CACHE_ENTRIES = int(os.environ.get("MEDIBOT_HANDWRITING_CACHE_ENTRIES", "2048"))
+HANDWRITING_CACHE_MB = int(os.environ.get("MEDIBOT_HANDWRITING_CACHE_MB", "16"))
+
+def build_handwriting_cache(backend=HANDWRITING_CACHE):
+    if backend in ("off", "none", "0", ""): return None
+    memory = LRUCache(max_entries=HANDWRITING_CACHE_ENTRIES, max_bytes=HANDWRITING_CACHE_MB * 1024 * 1024)
+    if backend == "sqlite":
+        shared = SqliteCache(HANDWRITING_CACHE_PATH, max_entries=HANDWRITING_CACHE_ENTRIES,
+                             max_bytes=HANDWRITING_CACHE_MB * 1024 * 1024)
+        return TieredCache(memory, shared)
+    return TieredCache(memory)
+
+class TokenLogProbs(LogitsProcessor):
+    """
+    Records the greedy token's log-probability at each decoding step: a (batch,)
+    tensor per step instead of output_scores' full (batch, vocab) logits.
+    Leaves the scores untouched.
+    """
     def __init__(self):
+        self.steps = []
+
+    def __call__(self, input_ids, scores):
+        self.steps.append(torch.log_softmax(scores.float(), dim=-1).max(dim=-1).values)
+        return scores
+
+class HandwritingBrain:
+    # --- LINE SEGMENTATION (TrOCR reads one text line per input) ---
+    LINE_BATCH_SIZE = 16       # lines decoded per generate() call
+    MIN_LINE_HEIGHT = 8        # px; thinner ink bands are noise / underlines
+    LINE_GAP_MERGE = 4         # px; blank runs shorter than this stay inside a line
+    LINE_PAD = 4               # px of margin kept around each line crop
+    INK_ROW_RATIO = 0.01       # a row is "ink" when this share of its pixels is dark
+
+    def __init__(self, max_new_tokens=HANDWRITING_MAX_NEW_TOKENS, num_beams=HANDWRITING_NUM_BEAMS,
+                 early_stopping=HANDWRITING_EARLY_STOPPING, timeout_sec=HANDWRITING_TIMEOUT_SEC, cache="default"):
         print("Loading Handwriting AI (TrOCR)...")
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.max_new_tokens = max(1, int(max_new_tokens))
+        self.num_beams = max(1, int(num_beams))
+        self.early_stopping = bool(early_stopping)
+        self.timeout_sec = float(timeout_sec)
+        self._stats = {"calls": 0, "truncated": 0, "steps": 0, "total_ms": 0.0}
+        self._stats_lock = threading.Lock()
+        self.cache = build_handwriting_cache() if cache == "default" else cache
 
         try:
             self.processor = TrOCRProcessor.from_pretrained(
@@ -26,42 +91,174 @@ class HandwritingBrain:
             print(f"⚠️ Handwriting AI Load Error: {e}")
             self.ai_ready = False
 
-    def read_handwriting(self, image_path):
+    def segment_lines(self, image, gray=None):
+        """
+        Splits a page into text-line crops (top to bottom) with a horizontal
+        projection profile; falls back to the whole image when no lines are found.
+        `gray` may be passed in when a grayscale view already exists.
+        """
+        if gray is None: gray = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY)
+        _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        height, width = ink.shape
+        if ink.mean() > 0.5: return [image]  # dark / inverted photo: not ink on paper
+
+        rows = ink.sum(axis=1) > max(1, width * self.INK_ROW_RATIO)
+        bands, start, gap = [], None, 0
+        for y, has_ink in enumerate(rows):
+            if has_ink:
+                if start is None: start = y
+                gap = 0
+            elif start is not None:
+                gap += 1
+                if gap > self.LINE_GAP_MERGE:
+                    bands.append((start, y - gap + 1))
+                    start, gap = None, 0
+        if start is not None: bands.append((start, height - gap))
+
+        lines = []
+        for top, bottom in bands:
+            if bottom - top < self.MIN_LINE_HEIGHT: continue
+            cols = np.flatnonzero(ink[top:bottom].any(axis=0))
+            if cols.size == 0: continue
+            box = (
+                max(0, int(cols[0]) - self.LINE_PAD), max(0, top - self.LINE_PAD),
+                min(width, int(cols[-1]) + 1 + self.LINE_PAD), min(height, bottom + self.LINE_PAD)
+            )
+            lines.append(image.crop(box))
+        return lines or [image]
+
+    def generation_kwargs(self, max_time=None):
+        kwargs = {"max_new_tokens": self.max_new_tokens, "num_beams": self.num_beams}
+        if self.num_beams > 1: kwargs["early_stopping"] = self.early_stopping
+        if max_time: kwargs["max_time"] = max_time
+        return kwargs
+
+    def _line_confidences(self, sequences, recorder):
+        """Mean token probability per decoded line (greedy decoding only; see TokenLogProbs)."""
+        if recorder is None or not recorder.steps: return []
+        log_probs = torch.stack(recorder.steps, dim=1)
+        tokens = sequences[:, 1:1 + log_probs.shape[1]]
+        mask = (tokens != self.processor.tokenizer.pad_token_id).float()
+        mean_log_prob = (log_probs.masked_fill(mask == 0, 0.0).sum(dim=1) / mask.sum(dim=1).clamp(min=1.0))
+        return mean_log_prob.exp().tolist()
+
+    def read_handwriting_detailed(self, image):
+        """
+        Reads a handwritten page (path or ImageContext) within the decoding budget.
+        Returns {text, confidence, truncated, lines, lines_decoded, steps, time_ms};
+        truncated=True means the token cap or timeout cut the text short.
+        confidence is None under beam search: beams would need output_scores, which keeps
+        the full-vocabulary logits of every step in memory.
+        """
+        result = {"text": "", "confidence": 0.0, "truncated": False, "lines": 0, "lines_decoded": 0, "steps": 0, "time_ms": 0.0}
+
         # --------------------------------------------------------------
         # SAFETY: Model availability check (ADDED)
         # --------------------------------------------------------------
         if not self.ai_ready:
-            return ""
+            return result
 
         # --------------------------------------------------------------
         # SAFETY: Image load guard (ADDED)
         # --------------------------------------------------------------
         try:
-            image = Image.open(image_path).convert("RGB")
+            context = as_image_context(image)
         except Exception:
-            return ""
+            return result
 
-        pixel_values = self.processor(
-            images=image,
-            return_tensors="pt"
-        ).pixel_values.to(self.device)
+        # Keyed on the source bytes, so a cache hit never decodes the image
+        cache_key = self.cache_key(context.data)
+        if self.cache is not None:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                cached["cached"] = True
+                return cached
 
-        # --------------------------------------------------------------
-        # SAFETY: No-grad inference (ADDED)
-        # --------------------------------------------------------------
-        with torch.no_grad():
-            generated_ids = self.model.generate(
-                pixel_values
-                # Optional future cap:
-                # max_length=128
-            )
+        try:
+            image = context.pil
+        except Exception:
+            return result
+
+        start_time = time.monotonic()
+        deadline = start_time + self.timeout_sec if self.timeout_sec else None
+        eos_id = self.processor.tokenizer.eos_token_id
+
+        # One padded generate() batch per LINE_BATCH_SIZE lines, reassembled in reading order
+        lines = self.segment_lines(image, context.gray)
+        result["lines"] = len(lines)
+        texts, confidences = [], []
+        for start in range(0, len(lines), self.LINE_BATCH_SIZE):
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
+                result["truncated"] = True  # out of time: remaining lines are not decoded
+                break
+
+            pixel_values = self.processor(
+                images=lines[start:start + self.LINE_BATCH_SIZE],
+                return_tensors="pt"
+            ).pixel_values.to(self.device)
+
+            # --------------------------------------------------------------
+            # SAFETY: No-grad inference (ADDED)
+            # --------------------------------------------------------------
+            recorder = TokenLogProbs() if self.num_beams == 1 else None
+            with torch.no_grad():
+                sequences = self.model.generate(
+                    pixel_values,
+                    logits_processor=LogitsProcessorList([recorder] if recorder else []),
+                    **self.generation_kwargs(remaining)
+                )
+
+            result["steps"] += sequences.shape[1] - 1
+            # A line without an end-of-sequence token was cut by max_new_tokens or max_time
+            if any(eos_id not in seq[1:].tolist() for seq in sequences):
+                result["truncated"] = True
+
+            texts.extend(self.processor.batch_decode(
+                sequences,
+                skip_special_tokens=True
+            ))
+            confidences.extend(self._line_confidences(sequences, recorder))
+
+        result["lines_decoded"] = len(texts)
+        result["text"] = "\n".join(t.strip() for t in texts if t.strip())
+        if self.num_beams > 1: result["confidence"] = None
+        elif confidences: result["confidence"] = round(sum(confidences) / len(confidences), 4)
+        result["time_ms"] = round((time.monotonic() - start_time) * 1000.0, 1)
+
+        with self._stats_lock:
+            self._stats["calls"] += 1
+            self._stats["truncated"] += int(result["truncated"])
+            self._stats["steps"] += result["steps"]
+            self._stats["total_ms"] += result["time_ms"]
+        if result["truncated"]:
+            print(f"⚠️ Handwriting decode truncated ({result['lines_decoded']}/{result['lines']} lines, {result['time_ms']} ms)")
+        elif self.cache is not None:
+            # Truncated reads are not cached: a rerun with more headroom may finish them
+            self.cache.put(cache_key, result)
+        return result
+
+    def cache_key(self, raw):
+        """Content hash of the image plus everything that changes the decoded text."""
+        digest = hashlib.sha256(raw).hexdigest()
+        config = json.dumps([HANDWRITING_MODEL_NAME, HANDWRITING_ENGINE_VERSION, self.max_new_tokens,
+                             self.num_beams, self.early_stopping, self.LINE_BATCH_SIZE])
+        return f"{digest}-{hashlib.sha256(config.encode('utf-8')).hexdigest()[:12]}"
 
-        generated_text = self.processor.batch_decode(
-            generated_ids,
-            skip_special_tokens=True
-        )[0]
+    def read_handwriting(self, image):
+        return self.read_handwriting_detailed(image)["text"]
 
-        return generated_text
+    def stats(self):
+        with self._stats_lock:
+            calls = self._stats["calls"]
+            return {
+                "calls": calls,
+                "truncated": self._stats["truncated"],
+                "avg_steps": round(self._stats["steps"] / calls, 1) if calls else 0.0,
+                "avg_ms": round(self._stats["total_ms"] / calls, 1) if calls else 0.0,
+                "budget": self.generation_kwargs(self.timeout_sec or None),
+                "cache": self.cache.stats() if self.cache is not None else None,
+            }
 
 _hand_brain = None
 def get_handwriting_brain():
@@ -0,0 +1,85 @@
+import io
+import cv2
+import numpy as np
+from PIL import Image
+
+# ------------------------------------------------------------------
+# OPTIONAL METADATA (NOT USED IN LOGIC)
+# ------------------------------------------------------------------
+IMAGE_CONTEXT_VERSION = "1.0.0"
+
+class ImageContext:
+    """
+    One decoded upload, shared by every engine that looks at it:
+      data        source bytes (read once)
+      pil         RGB PIL image (decoded once)
+      rgb / gray  NumPy views (rgb is zero-copy over pil)
+      crop_box    film bounding box, set by the vision brain (None = whole frame)
+      model_input per-engine preprocessed tensors, e.g. the 224x224 vision input
+    Derived views are built lazily on first use.
+    """
+    def __init__(self, data, path=None):
+        self.data = data
+        self.path = path
+        self.crop_box = None
+        self._pil = None
+        self._rgb = None
+        self._gray = None
+        self._film = None
+        self._model_inputs = {}
+
+    @classmethod
+    def from_path(cls, path):
+        with open(path, "rb") as f: return cls(f.read(), path)
+
+    @property
+    def pil(self):
+        if self._pil is None:
+            image = Image.open(io.BytesIO(self.data))
+            self._pil = image if image.mode == "RGB" else image.convert("RGB")
+        return self._pil
+
+    @property
+    def size(self):
+        return self.pil.size
+
+    @property
+    def rgb(self):
+        # Read-only view over the PIL buffer; engines that modify pixels copy first
+        if self._rgb is None: self._rgb = np.asarray(self.pil)
+        return self._rgb
+
+    @property
+    def gray(self):
+        if self._gray is None: self._gray = cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY)
+        return self._gray
+
+    @property
+    def film(self):
+        """The cropped film (PIL), or the full frame when no crop box is set."""
+        if self.crop_box is None: return self.pil
+        if self._film is None: self._film = self.pil.crop(self.crop_box)
+        return self._film
+
+    def set_crop_box(self, box):
+        self.crop_box = tuple(box) if box else None
+        self._film = None
+
+    def model_input(self, key, build):
+        """Returns the cached preprocessed input for `key`, building it with build() once."""
+        value = self._model_inputs.get(key)
+        if value is None: value = self._model_inputs[key] = build()
+        return value
+
+    def __getstate__(self):
+        # Process pools get the source bytes only; decoded views are rebuilt on the other side
+        return {"data": self.data, "path": self.path, "crop_box": self.crop_box}
+
+    def __setstate__(self, state):
+        self.__init__(state["data"], state["path"])
+        self.crop_box = state["crop_box"]
+
+def as_image_context(image):
+    """Accepts an ImageContext or a file path (older callers) and returns an ImageContext."""
+    if isinstance(image, ImageContext): return image
+    return ImageContext.from_path(image)
@@ -57,7 +57,60 @@ def is_negated_phrase(text, phrase, window=25):
     context = text[max(0, idx - window):idx]
     return any(n in context for n in ["no ", "not ", "negative ", "rule out "])
 
-# --- 2. THE COMPREHENSIVE PARSER ---
+# --- 2. COMPILED MATCHING TABLES ---
+# Built once at import. All marker keywords and critical phrases share one
+# alternation, so a report is scanned in a single pass; values are then read
+# from a bounded window after each keyword hit instead of an open-ended .*?
+NOISE_HEADERS = [
+    "Comment",
+    "Comments:",
+    "Note:",
+    "Interpretation:",
+    "Bio. Ref. Interval"
+]
+
+CRITICAL_PHRASES = {
+    "ST elevation": 4,
+    "Anterolateral injury": 4,
+    "Acute infarct": 4,
+    "Atrial fibrillation": 3,
+    "Malignancy": 4,
+    "Carcinoma": 4
+}
+
+# marker -> ("|"-separated keyword aliases, value regex searched in the window after the keyword)
+MARKER_PATTERNS = {
+    "HbA1c": (r"HbA1c", r"(\d+\.?\d*)\s*%"),
+    "hsCRP": (r"hsCRP|CARDIO C-REACTIVE", r"(\d+\.?\d*)\s*mg/L"),
+    "Troponin-I": (r"TROPONIN-I", r"(\d+\.?\d*)\s*ng/L"),
+    "Apolipoprotein B": (r"APOLIPOPROTEIN B", r"(\d+\.?\d*)"),
+    "Glucose": (r"GLUCOSE", r"(\d+\.?\d*)")
+}
+
+MARKER_WINDOW = 200  # max characters between a marker keyword and its value
+
+# lowercase keyword -> ("phrase", phrase) | ("marker", marker)
+KEYWORDS = {phrase.lower(): ("phrase", phrase) for phrase in CRITICAL_PHRASES}
+for _marker, (_keyword_re, _) in MARKER_PATTERNS.items():
+    for _alias in _keyword_re.split("|"):
+        KEYWORDS[_alias.lower()] = ("marker", _marker)
+
+# A plain literal alternation over lowercased text lets the regex engine use its
+# fast literal prefilter; the ignore-case variant is the fallback for the rare
+# text whose length changes under .lower() (offsets must stay aligned)
+_KEYWORD_ALTERNATION = "|".join(re.escape(k) for k in sorted(KEYWORDS, key=len, reverse=True))
+KEYWORD_INDEX = re.compile(_KEYWORD_ALTERNATION)
+KEYWORD_INDEX_I = re.compile(_KEYWORD_ALTERNATION, re.I)
+VALUE_PATTERNS = {marker: re.compile(value_re, re.I) for marker, (_, value_re) in MARKER_PATTERNS.items()}
+BCR_ABL_POSITIVE = re.compile(r"Positive.*?\(b3:a2\)", re.I)
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+def _is_whole_word(text, start, end):
+    return (start == 0 or not _is_word_char(text[start - 1])) and (end == len(text) or not _is_word_char(text[end]))
+
+# --- 3. THE COMPREHENSIVE PARSER ---
 class ComprehensiveParser:
     def parse(self, text):
         data = {
@@ -68,40 +121,46 @@ class ComprehensiveParser:
         }
         
         # --- PRE-PROCESSING: REMOVE NOISE SECTIONS ---
-        clean_text = text
-        noise_headers = [
-            "Comment",
-            "Comments:",
-            "Note:",
-            "Interpretation:",
-            "Bio. Ref. Interval"
-        ]
-
-        for header in noise_headers:
-            if header in clean_text:
-                parts = clean_text.split(header)
-                if len(parts) > 1:
-                    clean_text = parts[0]
+        # clean_text is always a prefix of text: everything before the first noise header
+        clean_end = len(text)
+        for header in NOISE_HEADERS:
+            idx = text.find(header, 0, clean_end)
+            if idx != -1:
+                clean_end = idx
+        clean_text = text[:clean_end]
 
         # FIX 1: DNA / MOLECULAR REPORT LOGIC
         if "BCR-ABL" in clean_text:
-            if re.search(r"Positive.*?\(b3:a2\)", clean_text, re.I):
+            if BCR_ABL_POSITIVE.search(clean_text):
                 self._add_finding(data, "BCR-ABL (CML)", "POSITIVE", 4)
             elif "Negative" in clean_text:
                 self._add_finding(data, "BCR-ABL", "NEGATIVE", 1)
 
-        # FIX 2: TEXT-BASED DIAGNOSIS (Strict Context)
-        critical_phrases = {
-            "ST elevation": 4,
-            "Anterolateral injury": 4,
-            "Acute infarct": 4,
-            "Atrial fibrillation": 3,
-            "Malignancy": 4,
-            "Carcinoma": 4
-        }
-
-        for phrase, tier in critical_phrases.items():
-            if re.search(r"\b" + re.escape(phrase) + r"\b", clean_text, re.I):
+        # --- SINGLE PASS: every phrase and marker keyword in one scan ---
+        phrases_found = set()
+        marker_values = {}
+        lowered = text.lower()
+        if len(lowered) == len(text): scan = KEYWORD_INDEX.finditer(lowered)
+        else: scan = KEYWORD_INDEX_I.finditer(text)
+
+        for match in scan:
+            kind, name = KEYWORDS[match.group(0).lower()]
+            if kind == "phrase":
+                # FIX 2: TEXT-BASED DIAGNOSIS (Strict Context) - whole words, before the noise sections
+                if match.end() <= clean_end and _is_whole_word(text, match.start(), match.end()):
+                    phrases_found.add(name)
+                continue
+
+            # FIX 3: ROBUST BIOCHEMISTRY EXTRACTION (NUMBERS) - first hit with a value wins
+            if name in marker_values:
+                continue
+            window = text[match.end():match.end() + MARKER_WINDOW]
+            value_match = VALUE_PATTERNS[name].search(window)
+            if value_match:
+                marker_values[name] = value_match.group(1)
+
+        for phrase, tier in CRITICAL_PHRASES.items():
+            if phrase in phrases_found:
                 # Negation guard exists but NOT enforced (future-ready)
                 self._add_finding(
                     data,
@@ -110,25 +169,15 @@ class ComprehensiveParser:
                     tier
                 )
 
-        # FIX 3: ROBUST BIOCHEMISTRY EXTRACTION (NUMBERS)
-        patterns = {
-            "HbA1c": r"HbA1c.*?(\d+\.?\d*)\s*%",
-            "hsCRP": r"(?:hsCRP|CARDIO C-REACTIVE).*?(\d+\.?\d*)\s*mg/L",
-            "Troponin-I": r"TROPONIN-I.*?(\d+\.?\d*)\s*ng/L",
-            "Apolipoprotein B": r"APOLIPOPROTEIN B.*?(\d+\.?\d*)", 
-            "Glucose": r"GLUCOSE.*?(\d+\.?\d*)"
-        }
-
-        for marker, regex in patterns.items():
-            match = re.search(regex, text, re.I | re.S)
-            if match:
-                raw_val = match.group(1)
-                try:
-                    val = float(raw_val)
-                    tier = triage_biomarker(marker, val)
-                    self._add_finding(data, marker, val, tier)
-                except Exception:
-                    continue 
+        for marker in MARKER_PATTERNS:
+            if marker not in marker_values:
+                continue
+            try:
+                val = float(marker_values[marker])
+                tier = triage_biomarker(marker, val)
+                self._add_finding(data, marker, val, tier)
+            except Exception:
+                continue 
 
         return data
 
@@ -148,6 +197,6 @@ class ComprehensiveParser:
         if tier > data["triage_summary"]["max_tier"]:
             data["triage_summary"]["max_tier"] = tier
 
+_parser = ComprehensiveParser()
 def extract_all_details(text):
-    parser = ComprehensiveParser()
-    return parser.parse(text)
+    return _parser.parse(text)
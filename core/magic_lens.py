@@ -1,25 +1,79 @@
 import os
+import time
 import cv2
 import numpy as np
-from PIL import Image
+from core.image_context import as_image_context
+
+# ------------------------------------------------------------------
+# WORKING RESOLUTION: edge features are found at full resolution; the
+# mask is then shrunk so its longest side is at most MAGIC_LENS_MAX_SIDE
+# px for the large blur, and upsampled only for the overlay
+# ------------------------------------------------------------------
+MAGIC_LENS_MAX_SIDE = int(os.environ.get("MEDIBOT_MAGIC_LENS_MAX_SIDE", "1024"))
 
 class MagicLensAI:
-    def __init__(self):
+    BLUR_KSIZE = 61        # smoothing kernel, in source pixels
+    MASK_THRESHOLD = 0.35  # mask values below this are not painted
+
+    def __init__(self, max_side=MAGIC_LENS_MAX_SIDE):
+        self.max_side = max_side
         print("🧬 MagicLens initialized (Organic Mode)")
 
-    def generate_abnormality_mask(self, gray):
+    def working_scale(self, shape, max_side=None):
+        max_side = self.max_side if max_side is None else max_side
+        return min(1.0, max_side / max(shape[:2])) if max_side else 1.0
+
+    @classmethod
+    def blur_sigma(cls, scale=1.0):
+        """Sigma of the source-resolution BLUR_KSIZE GaussianBlur (OpenCV's rule), in working pixels."""
+        return (0.3 * ((cls.BLUR_KSIZE - 1) * 0.5 - 1) + 0.8) * scale
+
+    def generate_abnormality_mask(self, gray, max_side=None):
+        """
+        float32 mask in [0, 1] at the working resolution for `max_side`, and its scale.
+        Edges and Laplacian are found on the full-resolution scan (they are what a downscale
+        would lose); only the 0.3 / 0.7 feature mask is shrunk (INTER_AREA) before the blur.
+        """
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
         gray = clahe.apply(gray)
         edges = cv2.Canny(gray, 100, 200)
-        lap = np.abs(cv2.Laplacian(gray, cv2.CV_64F))
+        lap = np.abs(cv2.Laplacian(gray, cv2.CV_16S))  # exact for uint8 input, a quarter of CV_64F
         mask = np.zeros_like(gray, dtype=np.float32)
         mask[edges > 0] += 0.3
-        mask[lap > np.mean(lap)*2] += 0.7 
-        mask = cv2.GaussianBlur(mask, (61, 61), 0)
-        if np.max(mask) > 0: mask /= np.max(mask)
-        return mask
+        mask[lap > np.mean(lap)*2] += 0.7
+        del edges, lap
+
+        height, width = gray.shape
+        scale = self.working_scale(gray.shape, max_side)
+        if scale < 1.0:
+            mask = cv2.resize(mask, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        # Sigma, not ksize, is scaled: OpenCV's ksize -> sigma rule is not proportional
+        mask = cv2.GaussianBlur(mask, (0, 0), self.blur_sigma(scale))
+        peak = float(mask.max())
+        if peak > 0: mask *= (1.0 / peak)
+        return mask, scale
+
+    def overlay_mask(self, img_gray, max_side=None):
+        """
+        Full-resolution uint8 mask ready for colouring (below-threshold values zeroed),
+        blurred at the working resolution for `max_side` (default self.max_side; 0 = full size).
+        Returns (mask_u8, working_shape).
+        """
+        height, width = img_gray.shape
 
-    def generate_heatmap(self, image_path, analysis, save_path):
+        # --- 1. FEATURES AT FULL RESOLUTION, BLUR AT WORKING RESOLUTION ---
+        mask, scale = self.generate_abnormality_mask(img_gray, max_side)
+        working_shape = mask.shape
+
+        # --- 2. UPSAMPLE ONCE (uint8), THEN THRESHOLD AT FULL SIZE ---
+        mask_u8 = np.uint8(mask * 255)
+        del mask
+        if scale < 1.0: mask_u8 = cv2.resize(mask_u8, (width, height), interpolation=cv2.INTER_LINEAR)
+        mask_u8[mask_u8 < int(self.MASK_THRESHOLD * 255)] = 0
+        return mask_u8, working_shape
+
+    def generate_heatmap(self, image, analysis, save_path):
+        """image: file path or ImageContext (its grayscale view is reused, not decoded again)"""
         # 🟢 FIX: Use 'triage' correctly (not 'severity')
         triage = analysis.get("triage", 0)
         
@@ -30,20 +84,28 @@ class MagicLensAI:
             return {"status": "skipped", "message": "Document detected"}
 
         try:
-            pil_img = Image.open(image_path).convert("L")
-            img_gray = np.array(pil_img)
-            img_color = cv2.cvtColor(img_gray, cv2.COLOR_GRAY2BGR)
+            start = time.perf_counter()
+            img_gray = as_image_context(image).gray
+            mask_u8, working_shape = self.overlay_mask(img_gray)
+            feature_bytes = img_gray.size * (1 + 1 + 2 + 4)  # clahe + edges + int16 laplacian + float32 mask
 
-            mask = self.generate_abnormality_mask(img_gray)
-            mask[mask < 0.35] = 0 
-
-            heatmap = cv2.applyColorMap(np.uint8(mask * 255), cv2.COLORMAP_JET)
+            # --- 3. COLOR AT FULL SIZE ---
+            img_color = cv2.cvtColor(img_gray, cv2.COLOR_GRAY2BGR)
+            heatmap = cv2.applyColorMap(mask_u8, cv2.COLORMAP_JET)
             overlay = cv2.addWeighted(img_color, 0.7, heatmap, 0.3, 0)
+            overlay_bytes = img_gray.nbytes + mask_u8.nbytes + img_color.nbytes + heatmap.nbytes + overlay.nbytes
 
             os.makedirs(os.path.dirname(save_path), exist_ok=True)
             cv2.imwrite(save_path, overlay)
 
-            return {"status": "success", "overlay_path": save_path}
+            return {
+                "status": "success",
+                "overlay_path": save_path,
+                "time_ms": round((time.perf_counter() - start) * 1000.0, 1),
+                "working_size": [working_shape[1], working_shape[0]],
+                # Arithmetic estimate from array sizes, not a measurement (see magic_lens_agreement.py)
+                "est_peak_bytes": max(img_gray.nbytes + feature_bytes, overlay_bytes)
+            }
 
         except Exception as e:
             return {"status": "error", "message": str(e)}
@@ -0,0 +1,41 @@
+import os
+import torch
+
+# ------------------------------------------------------------------
+# OPTIONAL METADATA (NOT USED IN LOGIC)
+# ------------------------------------------------------------------
+QUANTIZATION_ENGINE_VERSION = "1.0.0"
+
+# ------------------------------------------------------------------
+# CPU INFERENCE MODE (opt-in)
+#   MEDIBOT_QUANTIZE=int8     -> dynamic int8 weights for every nn.Linear
+#                                (ViT image tower + PubMedBERT text tower)
+#   MEDIBOT_TORCH_THREADS=N   -> intra-op threads (0 = torch default)
+# Check label agreement with fp32 before enabling: vision_agreement.py
+# ------------------------------------------------------------------
+QUANTIZE_MODE = os.environ.get("MEDIBOT_QUANTIZE", "").strip().lower()
+TORCH_THREADS = int(os.environ.get("MEDIBOT_TORCH_THREADS", "0"))
+
+def quantization_enabled(mode=None):
+    mode = QUANTIZE_MODE if mode is None else mode
+    return mode in ("1", "int8", "true")
+
+def configure_cpu_threads(num_threads=None):
+    """Pins torch's intra-op pool; one inference thread per physical core is usually fastest for int8."""
+    num_threads = TORCH_THREADS if num_threads is None else num_threads
+    if num_threads and torch.get_num_threads() != num_threads:
+        torch.set_num_threads(num_threads)
+    return torch.get_num_threads()
+
+def quantize_dynamic_int8(model, device="cpu"):
+    """
+    Swaps `model`'s Linear layers for int8 dynamically-quantized ones (in place, no fp32 copy kept).
+    Dynamic quantization is CPU-only, so any other device gets the model back unchanged.
+    """
+    if str(device) != "cpu":
+        print(f"⚠️ int8 quantization skipped: runs on CPU only (device={device})")
+        return model
+    model.eval()
+    quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    print(f"🗜️ Quantized to int8 (threads={torch.get_num_threads()})")
+    return quantized
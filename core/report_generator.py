@@ -18,9 +18,67 @@ CYBER_PINK = colors.HexColor("#db2777")  # Pink Neon
 CYBER_TEXT = colors.HexColor("#e2e8f0")  # White/Grey Text
 CYBER_DIM = colors.HexColor("#94a3b8")   # Dim Text
 
-def draw_background(c, doc):
-    """Draws the dark cyberpunk background on every page"""
-    c.saveState()
+# 5% white over CYBER_DARK, pre-blended: the background is a form XObject, and a
+# translucent colour there would need an ExtGState the form's resources do not carry
+CYBER_GRID = colors.Color(*(0.95 * c + 0.05 for c in CYBER_DARK.rgb()))
+
+# ==========================================
+# 🧾 PREBUILT STYLES (built once per process, shared by every report)
+# ==========================================
+_SAMPLE_STYLES = getSampleStyleSheet()
+TITLE_STYLE = ParagraphStyle('CyberTitle', parent=_SAMPLE_STYLES['Heading1'], fontName='Helvetica-Bold', fontSize=24, textColor=CYBER_BLUE, alignment=TA_CENTER, spaceAfter=20)
+HEADING_STYLE = ParagraphStyle('CyberHeading', parent=_SAMPLE_STYLES['Heading2'], fontName='Helvetica-Bold', fontSize=14, textColor=CYBER_PINK, spaceBefore=15, spaceAfter=10)
+TEXT_STYLE = ParagraphStyle('CyberText', parent=_SAMPLE_STYLES['Normal'], fontName='Helvetica', fontSize=10, textColor=CYBER_TEXT, leading=14)
+CAPTION_STYLE = ParagraphStyle('Caption', parent=TEXT_STYLE, alignment=TA_CENTER, textColor=CYBER_BLUE, fontSize=8)
+DISCLAIMER_STYLE = ParagraphStyle('Disclaimer', parent=TEXT_STYLE, fontSize=7, textColor=CYBER_DIM, alignment=TA_CENTER)
+
+# Style for raw handwriting extraction box
+RAW_BOX_STYLE = ParagraphStyle(
+    'RawBox',
+    parent=TEXT_STYLE,
+    backColor=CYBER_PANEL,
+    borderPadding=15,
+    borderColor=CYBER_PINK,
+    borderWidth=1,
+    leading=16,
+    fontName='Helvetica-Bold'
+)
+
+# Verdict box per severity tier (color is the only thing that changes)
+def _verdict_color(sev):
+    return colors.red if sev >= 4 else (colors.orange if sev == 3 else (colors.yellow if sev == 2 else colors.green))
+
+VERDICT_STYLES = {
+    v_color: ParagraphStyle('VerdictBox', parent=_SAMPLE_STYLES['Normal'], fontName='Helvetica-Bold', fontSize=12, textColor=v_color, backColor=CYBER_PANEL, borderPadding=10, borderColor=v_color, borderWidth=1, alignment=TA_CENTER)
+    for v_color in (colors.red, colors.orange, colors.yellow, colors.green)
+}
+
+MARKER_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), CYBER_BLUE),
+    ('TEXTCOLOR', (0, 0), (-1, 0), CYBER_DARK),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('BACKGROUND', (0, 1), (-1, -1), CYBER_PANEL),
+    ('TEXTCOLOR', (0, 1), (-1, -1), CYBER_TEXT),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+])
+
+PRESCRIPTION_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), CYBER_PINK),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('BACKGROUND', (0, 1), (-1, -1), CYBER_PANEL),
+    ('TEXTCOLOR', (0, 1), (-1, -1), CYBER_TEXT),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.Color(1,1,1, alpha=0.1)),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+DISCLAIMER_TEXT = "DISCLAIMER: This report is generated by an AI system (MediBot). It is intended for informational and triage purposes only. It is NOT a substitute for professional medical advice, diagnosis, or treatment. Always consult a licensed physician."
+
+BACKGROUND_FORM = "MedibotBackground"
+
+def _draw_background_form(c):
+    """Background drawing ops, recorded once per document as a reusable form XObject."""
+    c.beginForm(BACKGROUND_FORM)
     c.setFillColor(CYBER_DARK)
     c.rect(0, 0, A4[0], A4[1], fill=True, stroke=False)
     
@@ -32,17 +90,37 @@ def draw_background(c, doc):
     c.setStrokeColor(CYBER_PINK)
     c.line(0, 50, A4[0], 50)  # Bottom Bar
     
-    # Grid Effect
-    c.setStrokeColor(colors.Color(1, 1, 1, alpha=0.05))
+    # Grid Effect (one path instead of a stroke per line)
+    c.setStrokeColor(CYBER_GRID)
     c.setLineWidth(1)
+    grid = c.beginPath()
     for i in range(0, int(A4[1]), 40):
-        c.line(0, i, A4[0], i)
+        grid.moveTo(0, i)
+        grid.lineTo(A4[0], i)
+    c.drawPath(grid, stroke=1, fill=0)
         
     # Footer Text
     c.setFont("Helvetica", 8)
     c.setFillColor(CYBER_DIM)
     c.drawCentredString(A4[0]/2, 30, "MEDIBOT AI • OFFICIAL DIAGNOSTIC REPORT • CONFIDENTIAL")
-    c.restoreState()
+    c.endForm()
+
+def draw_background(c, doc):
+    """Draws the dark cyberpunk background on every page"""
+    # The form is defined on the first page and only referenced on later ones
+    if not getattr(c, "_medibot_background", False):
+        _draw_background_form(c)
+        c._medibot_background = True
+    c.doForm(BACKGROUND_FORM)
+
+def _heatmap_source(heatmap):
+    """Path, raw image bytes or a file-like buffer -> something platypus.Image can read (None if absent)."""
+    if heatmap is None: return None
+    if isinstance(heatmap, (bytes, bytearray, memoryview)): return io.BytesIO(bytes(heatmap))
+    if hasattr(heatmap, "read"):
+        if hasattr(heatmap, "seek"): heatmap.seek(0)
+        return heatmap
+    return heatmap if os.path.exists(heatmap) else None
 
 def generate_official_pdf(verdict_data, lab_data=None, prescription_data=None, heatmap_path=None):
     """
@@ -50,7 +128,7 @@ def generate_official_pdf(verdict_data, lab_data=None, prescription_data=None, h
     verdict_data: dict {'verdict', 'summary', 'severity_score'}
     lab_data: dict {'clinical_analysis': []}
     prescription_data: string (raw AI text) or list of dicts
-    heatmap_path: Local path to the heatmap image
+    heatmap_path: Local path to the heatmap image, or its encoded bytes / an in-memory buffer
     """
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(
@@ -60,18 +138,14 @@ def generate_official_pdf(verdict_data, lab_data=None, prescription_data=None, h
         topMargin=80, bottomMargin=80
     )
 
-    styles = getSampleStyleSheet()
-    
-    # --- STYLES ---
-    title_style = ParagraphStyle('CyberTitle', parent=styles['Heading1'], fontName='Helvetica-Bold', fontSize=24, textColor=CYBER_BLUE, alignment=TA_CENTER, spaceAfter=20)
-    heading_style = ParagraphStyle('CyberHeading', parent=styles['Heading2'], fontName='Helvetica-Bold', fontSize=14, textColor=CYBER_PINK, spaceBefore=15, spaceAfter=10)
-    text_style = ParagraphStyle('CyberText', parent=styles['Normal'], fontName='Helvetica', fontSize=10, textColor=CYBER_TEXT, leading=14)
+    # --- STYLES (prebuilt at import) ---
+    title_style = TITLE_STYLE
+    heading_style = HEADING_STYLE
+    text_style = TEXT_STYLE
 
     # Verdict Color Logic
     sev = verdict_data.get("severity_score", 1)
-    v_color = colors.red if sev >= 4 else (colors.orange if sev == 3 else (colors.yellow if sev == 2 else colors.green))
-
-    verdict_style = ParagraphStyle('VerdictBox', parent=styles['Normal'], fontName='Helvetica-Bold', fontSize=12, textColor=v_color, backColor=CYBER_PANEL, borderPadding=10, borderColor=v_color, borderWidth=1, alignment=TA_CENTER)
+    verdict_style = VERDICT_STYLES[_verdict_color(sev)]
 
     elements = []
 
@@ -89,15 +163,15 @@ def generate_official_pdf(verdict_data, lab_data=None, prescription_data=None, h
     elements.append(Spacer(1, 20))
 
     # 3. VISUAL ANALYSIS (Heatmap)
-    if heatmap_path and os.path.exists(heatmap_path):
+    heatmap_source = _heatmap_source(heatmap_path)
+    if heatmap_source is not None:
         elements.append(Paragraph("VISUAL ATTENTION ANALYSIS", heading_style))
         try:
-            img = Image(heatmap_path, width=4*inch, height=3*inch)
+            img = Image(heatmap_source, width=4*inch, height=3*inch)
             img.hAlign = 'CENTER'
             elements.append(img)
             elements.append(Spacer(1, 10))
-            elements.append(Paragraph("[ AI GENERATED ATTENTION MAP ]", 
-                                     ParagraphStyle('Caption', parent=text_style, alignment=TA_CENTER, textColor=CYBER_BLUE, fontSize=8)))
+            elements.append(Paragraph("[ AI GENERATED ATTENTION MAP ]", CAPTION_STYLE))
         except Exception as e:
             elements.append(Paragraph(f"Image Load Error: {str(e)}", text_style))
         elements.append(Spacer(1, 20))
@@ -112,33 +186,14 @@ def generate_official_pdf(verdict_data, lab_data=None, prescription_data=None, h
             data.append([str(item.get("Marker", "")), str(item.get("Value", "")), status])
 
         table = Table(data, colWidths=[200, 100, 100])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), CYBER_BLUE),
-            ('TEXTCOLOR', (0, 0), (-1, 0), CYBER_DARK),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('BACKGROUND', (0, 1), (-1, -1), CYBER_PANEL),
-            ('TEXTCOLOR', (0, 1), (-1, -1), CYBER_TEXT),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ]))
+        table.setStyle(MARKER_TABLE_STYLE)
         elements.append(table)
         elements.append(Spacer(1, 20))
 
     # 5. 💊 MEDICATION LEDGER (Prescription)
     if prescription_data:
         elements.append(Paragraph("OFFICIAL MEDICATION RECORD", heading_style))
-        
-        # Style for raw handwriting extraction box
-        raw_box_style = ParagraphStyle(
-            'RawBox',
-            parent=text_style,
-            backColor=CYBER_PANEL,
-            borderPadding=15,
-            borderColor=CYBER_PINK,
-            borderWidth=1,
-            leading=16,
-            fontName='Helvetica-Bold'
-        )
+        raw_box_style = RAW_BOX_STYLE
 
         if isinstance(prescription_data, str):
             # Preserves formatting from doc_to_text.py extraction
@@ -154,21 +209,13 @@ def generate_official_pdf(verdict_data, lab_data=None, prescription_data=None, h
                     Paragraph(str(med.get('instructions', med.get('timing', 'N/A'))), text_style)
                 ])
             p_table = Table(p_rows, colWidths=[150, 80, 170])
-            p_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), CYBER_PINK),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('BACKGROUND', (0, 1), (-1, -1), CYBER_PANEL),
-                ('TEXTCOLOR', (0, 1), (-1, -1), CYBER_TEXT),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.Color(1,1,1, alpha=0.1)),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
+            p_table.setStyle(PRESCRIPTION_TABLE_STYLE)
             elements.append(p_table)
         elements.append(Spacer(1, 20))
 
     # 6. DISCLAIMER
     elements.append(Spacer(1, 30))
-    disclaimer = "DISCLAIMER: This report is generated by an AI system (MediBot). It is intended for informational and triage purposes only. It is NOT a substitute for professional medical advice, diagnosis, or treatment. Always consult a licensed physician."
-    elements.append(Paragraph(disclaimer, ParagraphStyle('Disclaimer', parent=text_style, fontSize=7, textColor=CYBER_DIM, alignment=TA_CENTER)))
+    elements.append(Paragraph(DISCLAIMER_TEXT, DISCLAIMER_STYLE))
 
     # Build PDF
     doc.build(elements, onFirstPage=draw_background, onLaterPages=draw_background)
@@ -0,0 +1,26 @@
+import sys
+import argparse
+
+# ------------------------------------------------------------------
+# 📦 VISION EXPORT
+# Traces BiomedCLIP's image tower to TorchScript and saves it with the
+# precomputed label bank, for MEDIBOT_VISION_BACKEND=torchscript:
+#   python export_vision_model.py --out models/vision_torchscript
+# Re-run after editing Medical_AI_Knowledge_Base (the label bank is baked in),
+# then check parity: python vision_agreement.py <images> --mode torchscript
+# ------------------------------------------------------------------
+def main():
+    from core.ai_vision import MedicalVisionBrain, export_torchscript, VISION_ARTIFACT_DIR
+
+    parser = argparse.ArgumentParser(description="Export the vision brain to a TorchScript artifact")
+    parser.add_argument("--out", default=VISION_ARTIFACT_DIR)
+    parser.add_argument("--quantize", action="store_true", help="export the int8 dynamically-quantized model")
+    args = parser.parse_args()
+
+    brain = MedicalVisionBrain(quantize=args.quantize)
+    metadata = export_torchscript(brain, args.out)
+    print(f"✅ Exported {metadata['model_name']} (KB {metadata['kb_version']}) -> {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
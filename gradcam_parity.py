@@ -0,0 +1,86 @@
+import sys
+import argparse
+
+# ------------------------------------------------------------------
+# 🔬 GRAD-CAM PARITY CHECK
+# Compares the vectorized, head-only Grad-CAM (MagicLensAI.compute_cams)
+# with the original implementation (full forward + backward through a
+# norm5 hook, then a per-channel weighted sum) on the same images:
+#   python gradcam_parity.py scan1.jpg scan2.png
+#   python gradcam_parity.py --random-weights      # offline, synthetic inputs
+# A map further than --atol from the reference fails the run (exit 1).
+# ------------------------------------------------------------------
+def reference_cam(lens, img_pil):
+    """The original single-image Grad-CAM, kept here as the reference."""
+    import numpy as np
+    input_tensor = lens.preprocess(img_pil).unsqueeze(0).to(lens.device)
+    activations, gradients = [], []
+
+    def forward_hook(module, input, output):
+        activations.append(output)
+        output.register_hook(lambda grad: gradients.append(grad))
+
+    handle = lens.model.features.norm5.register_forward_hook(forward_hook)
+    try:
+        output = lens.model(input_tensor)
+        target_category = output.argmax(dim=1)
+        lens.model.zero_grad()
+        output[0, target_category].backward()
+    finally:
+        handle.remove()
+
+    grad = gradients[0].detach().numpy()[0]
+    act = activations[0].detach().numpy()[0]
+    weights = np.mean(grad, axis=(1, 2))
+    cam = np.zeros(act.shape[1:], dtype=np.float32)
+    for i, w in enumerate(weights):
+        cam += w * act[i]
+    cam = np.maximum(cam, 0)
+    if np.max(cam) > 0: cam /= np.max(cam)
+    return cam
+
+def synthetic_images(count, seed=0):
+    import numpy as np
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    return [Image.fromarray(rng.integers(0, 256, (256 + 32 * i, 320, 3), dtype=np.uint8)) for i in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Vectorized Grad-CAM vs the original per-channel loop")
+    parser.add_argument("images", nargs="*", help="image files (default: synthetic noise images)")
+    parser.add_argument("--random-weights", action="store_true", help="untrained DenseNet121 (no weight download)")
+    parser.add_argument("--count", type=int, default=4, help="synthetic images when no files are given")
+    parser.add_argument("--atol", type=float, default=1e-4, help="max abs difference on the [0, 1] map")
+    args = parser.parse_args()
+
+    import numpy as np
+    import torch
+    from torchvision import models
+    from app.assets.magic_lens import MagicLensAI
+
+    lens = MagicLensAI()
+    if args.random_weights:
+        torch.manual_seed(0)
+        lens.model = models.densenet121(weights=None).eval().to(lens.device)
+        lens.ai_ready = True
+    if not lens.ai_ready:
+        print("❌ DenseNet121 weights unavailable (use --random-weights offline)")
+        return 2
+
+    images = [lens._prepare_image(path) for path in args.images] or synthetic_images(args.count)
+    cams = lens.compute_cams(images)
+
+    worst = 0.0
+    for i, (img_pil, cam) in enumerate(zip(images, cams)):
+        diff = float(np.abs(cam - reference_cam(lens, img_pil)).max())
+        worst = max(worst, diff)
+        print(f"  image {i}: max |diff| {diff:.2e}")
+
+    if worst > args.atol:
+        print(f"\n❌ Grad-CAM maps differ by {worst:.2e} (> {args.atol:.0e})")
+        return 1
+    print(f"\n✅ Vectorized Grad-CAM matches the reference (max |diff| {worst:.2e})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
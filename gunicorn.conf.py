@@ -0,0 +1,48 @@
+import gc
+import os
+
+# ------------------------------------------------------------------
+# 🍴 PRELOAD-THEN-FORK SERVER MODE
+#   gunicorn -c gunicorn.conf.py app.api:app
+# The master imports app.api once with MEDIBOT_PRELOAD=1, so BiomedCLIP,
+# TrOCR and MagicLens are loaded a single time; workers are forked from it
+# and share the weight pages copy-on-write. Each worker only adds its own
+# activations, sqlite connection and executor pools.
+# ------------------------------------------------------------------
+os.environ.setdefault("MEDIBOT_PRELOAD", "1")
+
+bind = os.environ.get("MEDIBOT_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("MEDIBOT_WORKERS", "0")) or max(2, (os.cpu_count() or 2) // 2)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.environ.get("MEDIBOT_WORKER_TIMEOUT", "300"))
+
+# Torch intra-op threads per worker (0 = cores / workers); N workers x all cores oversubscribes the CPU
+TORCH_THREADS = int(os.environ.get("MEDIBOT_TORCH_THREADS", "0")) or max(1, (os.cpu_count() or 2) // workers)
+
+# Fork safety: the preload runs torch ops (label bank warmup, int8 quantization).
+# With more than one intra-op thread those start libgomp's OpenMP team in the
+# master, and a forked child inherits the pool's state but not its threads, so
+# its first parallel op can hang. The master therefore preloads single-threaded
+# and every worker raises its own thread count in post_fork.
+os.environ["MEDIBOT_TORCH_THREADS"] = "1"
+import torch
+torch.set_num_threads(1)
+
+# Collections during import would touch every object header; hold them until the fork
+gc.disable()
+
+def when_ready(server):
+    # Move everything the preload created into the permanent generation, so the
+    # workers' garbage collector never writes to (and un-shares) those pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Preloaded models frozen ({gc.get_freeze_count()} objects shared with workers)")
+
+def post_fork(server, worker):
+    gc.enable()
+    # Fresh OpenMP pool per worker (see fork safety above); later configure_cpu_threads() calls agree
+    import core.quantization
+    os.environ["MEDIBOT_TORCH_THREADS"] = str(TORCH_THREADS)
+    core.quantization.TORCH_THREADS = TORCH_THREADS
+    torch.set_num_threads(TORCH_THREADS)
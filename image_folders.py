@@ -0,0 +1,16 @@
+import os
+
+# ------------------------------------------------------------------
+# 📂 IMAGE FOLDERS
+# Shared by the offline harnesses (vision_agreement.py,
+# magic_lens_agreement.py): every scan under a folder, in a stable order.
+# ------------------------------------------------------------------
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+def list_images(folder, limit=0):
+    paths = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS): paths.append(os.path.join(root, name))
+    paths.sort()
+    return paths[:limit] if limit else paths
@@ -2,13 +2,15 @@ import torch
 import open_clip
 from PIL import Image
 import io
+from core.quantization import quantization_enabled, configure_cpu_threads, quantize_dynamic_int8
 
 # Force CPU if CUDA is causing issues, otherwise use auto
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
 class InjuryScanner:
-    def __init__(self):
+    def __init__(self, quantize=None):
         print("⚡ Initializing Medical Vision Brain...")
+        self.quantized = quantization_enabled() if quantize is None else bool(quantize)
         
         # 1. Load BioMedCLIP (Vision Model)
         try:
@@ -21,6 +23,14 @@ class InjuryScanner:
             self.tokenizer = open_clip.get_tokenizer('hf-hub:microsoft/BiomedCLIP-PubMedBERT_256-vit_base_patch16_224')
             
             self.model.to(DEVICE)
+            self.model.eval()
+
+            # Opt-in int8 CPU mode (MEDIBOT_QUANTIZE=int8)
+            if DEVICE == "cpu": configure_cpu_threads()
+            if self.quantized and DEVICE == "cpu":
+                self.model = quantize_dynamic_int8(self.model, DEVICE)
+            else:
+                self.quantized = False
             print("✅ AI Models Loaded Successfully")
             
         except Exception as e:
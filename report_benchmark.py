@@ -0,0 +1,86 @@
+import io
+import sys
+import time
+import argparse
+
+# ------------------------------------------------------------------
+# ⏱️ REPORT RENDERING BENCHMARK
+# Renders sample reports back to back and prints reports per second:
+#   python report_benchmark.py --count 200
+#   python report_benchmark.py --count 200 --heatmap      # with an in-memory overlay
+#   python report_benchmark.py --verify                   # render with PyMuPDF and check the output
+# --verify exits with status 1 if MuPDF reports errors while rendering or
+# the page background (grid included) is not the dark theme colour.
+# ------------------------------------------------------------------
+SAMPLE_VERDICT = {"verdict": "Pneumonia", "summary": "Right lower lobe consolidation.", "severity_score": 3}
+SAMPLE_LABS = {"clinical_analysis": [
+    {"Marker": "HbA1c", "Value": 6.8, "Tier": 4},
+    {"Marker": "hsCRP", "Value": 4.2, "Tier": 3},
+    {"Marker": "Glucose", "Value": 98.0, "Tier": 1},
+]}
+SAMPLE_PRESCRIPTION = "Rx\nAmoxicillin 500mg\nSig: 1 cap tid x 7 days\nParacetamol 650mg PRN"
+
+def sample_heatmap(size=(640, 480)):
+    """A synthetic JPEG overlay held in memory (the report never touches disk for it)."""
+    from PIL import Image
+    img = Image.linear_gradient("L").resize(size).convert("RGB")
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+BACKGROUND_COLUMN = 20            # pt from the left edge: left of every content block
+BACKGROUND_ROWS = range(60, 780)  # pt from the top: between the neon bars
+BACKGROUND_TOLERANCE = 16         # per channel, 0-255; the blended grid is ~12 above the base
+
+def verify(pdf_bytes):
+    """Renders every page at 72 dpi; returns a list of problems (empty when the report is fine)."""
+    import fitz
+    from core.report_generator import CYBER_DARK
+    expected = [round(c * 255) for c in CYBER_DARK.rgb()]
+
+    problems = []
+    fitz.TOOLS.mupdf_warnings()  # drop anything left from earlier documents
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        for page in doc:
+            pix = page.get_pixmap(dpi=72)
+            worst = max(
+                max(abs(a - b) for a, b in zip(pix.pixel(BACKGROUND_COLUMN, y), expected))
+                for y in BACKGROUND_ROWS
+            )
+            if worst > BACKGROUND_TOLERANCE:
+                problems.append(f"page {page.number + 1}: background off by {worst} (> {BACKGROUND_TOLERANCE})")
+    messages = fitz.TOOLS.mupdf_warnings()
+    if messages: problems.append(f"MuPDF: {messages}")
+    return problems
+
+def main():
+    from core.report_generator import generate_official_pdf
+
+    parser = argparse.ArgumentParser(description="Reports per second for generate_official_pdf")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--heatmap", action="store_true", help="embed an in-memory heatmap in every report")
+    parser.add_argument("--verify", action="store_true", help="render one report with PyMuPDF and check it")
+    args = parser.parse_args()
+
+    heatmap = sample_heatmap() if args.heatmap else None
+    if args.verify:
+        problems = verify(generate_official_pdf(SAMPLE_VERDICT, SAMPLE_LABS, SAMPLE_PRESCRIPTION, heatmap))
+        for problem in problems: print(f"❌ {problem}")
+        if problems: return 1
+        print("✅ Report renders cleanly")
+        return 0
+
+    generate_official_pdf(SAMPLE_VERDICT, SAMPLE_LABS, SAMPLE_PRESCRIPTION, heatmap)  # warm-up (fonts, imports)
+
+    total_bytes = 0
+    start = time.perf_counter()
+    for _ in range(args.count):
+        total_bytes += len(generate_official_pdf(SAMPLE_VERDICT, SAMPLE_LABS, SAMPLE_PRESCRIPTION, heatmap))
+    elapsed = time.perf_counter() - start
+
+    print(f"📄 {args.count} reports in {elapsed:.2f}s")
+    print(f"   {args.count / elapsed:.1f} reports/s, {elapsed * 1000.0 / args.count:.1f} ms/report, {total_bytes / args.count / 1024:.1f} KB avg")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
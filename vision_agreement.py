@@ -0,0 +1,101 @@
+import os
+import sys
+import time
+import argparse
+from image_folders import list_images
+
+# ------------------------------------------------------------------
+# 🔬 VISION ACCURACY HARNESS
+# Runs a local image folder through the eager fp32 brain and a candidate
+# backend and reports how often they agree, plus load time and latency:
+#   python vision_agreement.py path/to/images --threads 4                # int8
+#   python vision_agreement.py path/to/images --mode torchscript         # exported artifact
+# Gates: triage agreement >= --min-triage-agreement, label and modality
+# agreement >= --min-label-agreement (both default 100%); otherwise exit 1.
+# ------------------------------------------------------------------
+COMPARED_FIELDS = ["modality", "label", "triage"]
+
+def load_brain(mode, artifact_dir=None):
+    from core.ai_vision import MedicalVisionBrain, CompiledVisionBrain
+    if mode == "torchscript": return CompiledVisionBrain(artifact_dir) if artifact_dir else CompiledVisionBrain()
+    return MedicalVisionBrain(quantize=(mode == "int8"))
+
+def run_brain(mode, paths, batch_size, artifact_dir=None):
+    """Loads one brain, warms it up, then times analyze_images over every path."""
+    start = time.perf_counter()
+    brain = load_brain(mode, artifact_dir)
+    load_ms = (time.perf_counter() - start) * 1000.0
+    brain.analyze_images(paths[:1])  # first call pays one-off allocation costs
+
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(paths), batch_size):
+        results.extend(brain.analyze_images(paths[i:i + batch_size]))
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    del brain
+    return results, load_ms, elapsed_ms / max(len(paths), 1)
+
+def compare(paths, baseline, candidate):
+    agree = {field: 0 for field in COMPARED_FIELDS}
+    mismatches = []
+    for path, a, b in zip(paths, baseline, candidate):
+        diff = {}
+        for field in COMPARED_FIELDS:
+            if a.get(field) == b.get(field): agree[field] += 1
+            else: diff[field] = (a.get(field), b.get(field))
+        if diff: mismatches.append((path, diff))
+    total = max(len(paths), 1)
+    return {field: count / total for field, count in agree.items()}, mismatches
+
+def main():
+    parser = argparse.ArgumentParser(description="Label agreement of an optimized vision backend with eager fp32")
+    parser.add_argument("images", help="folder of validation images (searched recursively)")
+    parser.add_argument("--mode", choices=["int8", "torchscript"], default="int8")
+    parser.add_argument("--artifact", default=None, help="TorchScript artifact dir (default MEDIBOT_VISION_ARTIFACT)")
+    parser.add_argument("--limit", type=int, default=0, help="use only the first N images")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--threads", type=int, default=0, help="torch intra-op threads (0 = default)")
+    parser.add_argument("--min-triage-agreement", type=float, default=1.0)
+    parser.add_argument("--min-label-agreement", type=float, default=1.0, help="applies to label and modality")
+    args = parser.parse_args()
+
+    if args.threads: os.environ["MEDIBOT_TORCH_THREADS"] = str(args.threads)
+
+    paths = list_images(args.images, args.limit)
+    if not paths:
+        print(f"❌ No images found under {args.images}")
+        return 2
+    print(f"📂 {len(paths)} images")
+
+    fp32_results, fp32_load_ms, fp32_ms = run_brain("fp32", paths, args.batch_size)
+    cand_results, cand_load_ms, cand_ms = run_brain(args.mode, paths, args.batch_size, args.artifact)
+    agreement, mismatches = compare(paths, fp32_results, cand_results)
+
+    print(f"\n--- AGREEMENT ({args.mode} vs fp32) ---")
+    for field in COMPARED_FIELDS:
+        print(f"  {field:<10} {agreement[field] * 100:6.2f}%")
+    print("\n--- STARTUP (ms) ---")
+    print(f"  {'fp32':<12} {fp32_load_ms:8.0f}")
+    print(f"  {args.mode:<12} {cand_load_ms:8.0f}   ({fp32_load_ms / max(cand_load_ms, 1e-6):.2f}x)")
+    print("\n--- LATENCY (ms / image) ---")
+    print(f"  {'fp32':<12} {fp32_ms:8.1f}")
+    print(f"  {args.mode:<12} {cand_ms:8.1f}   ({fp32_ms / max(cand_ms, 1e-6):.2f}x)")
+
+    if mismatches:
+        print(f"\n--- MISMATCHES ({len(mismatches)}) ---")
+        for path, diff in mismatches:
+            changes = ", ".join(f"{field}: {a!r} -> {b!r}" for field, (a, b) in diff.items())
+            print(f"  {os.path.basename(path)}: {changes}")
+
+    minimums = {"modality": args.min_label_agreement, "label": args.min_label_agreement, "triage": args.min_triage_agreement}
+    failed = [field for field in COMPARED_FIELDS if agreement[field] < minimums[field]]
+    if failed:
+        print()
+        for field in failed:
+            print(f"❌ {field.capitalize()} agreement {agreement[field] * 100:.2f}% is below {minimums[field] * 100:.2f}%")
+        return 1
+    print("\n✅ Modality, label and triage outcomes preserved")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())